@@ -0,0 +1,194 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config.settings import settings
+
+# Contexto de la petición en curso (lo fija LoggingMiddleware)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+log_sampled_var: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["BoundedQueueHandler"] = None
+_sample_rates: List[Tuple[str, float]] = []
+
+
+def _sample_rate(path: str) -> float:
+    """Tasa de muestreo del prefijo de ruta más largo configurado"""
+    for prefix, rate in _sample_rates:
+        if path.startswith(prefix):
+            return rate
+    return settings.log_sample_rate
+
+
+def bind_request(request_id: str, path: str) -> Tuple[Token, Token]:
+    """Asocia el request id a los logs de la petición y decide si se muestrean sus logs de éxito"""
+    rate = _sample_rate(path)
+    sampled = rate >= 1.0 or random.random() < rate
+    return request_id_var.set(request_id), log_sampled_var.set(sampled)
+
+
+def unbind_request(tokens: Tuple[Token, Token]) -> None:
+    request_id_var.reset(tokens[0])
+    log_sampled_var.reset(tokens[1])
+
+
+class RequestContextFilter(logging.Filter):
+    """Agrega el request id y descarta los logs de éxito de peticiones no muestreadas.
+
+    Se ejecuta en el hilo que emite el log, donde aún está el contexto de
+    la petición. WARNING y superiores se conservan siempre.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        if record.levelno < logging.WARNING and not log_sampled_var.get():
+            self.sampled_out += 1
+            return False
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler con cola acotada: si está llena el registro se descarta en lugar de bloquear.
+
+    El mensaje se formatea y trunca a ``log_max_message_length`` antes de
+    encolarlo, de modo que la memoria de la cola queda acotada por
+    ``log_queue_size`` registros de tamaño limitado.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_message_length: int):
+        super().__init__(log_queue)
+        self.max_message_length = max_message_length
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        if isinstance(record.msg, dict):
+            # Evento de structlog: lo renderiza ProcessorFormatter en el hilo de escritura
+            return record
+
+        message = record.getMessage()
+        if len(message) > self.max_message_length:
+            message = message[:self.max_message_length] + "…[truncado]"
+        if record.exc_info:
+            message = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Con la cola llena put_nowait fallaría; se espera a que el hilo de escritura libere espacio
+        self.queue.put(self._sentinel)
+
+
+def _add_request_id(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    event_dict.setdefault("request_id", request_id_var.get() or "-")
+    return event_dict
+
+
+def _formatter() -> logging.Formatter:
+    if settings.log_format != "json":
+        return logging.Formatter(TEXT_FORMAT)
+
+    return structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.ExtraAdder(allow=["request_id"]),
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
+        ],
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(ensure_ascii=False),
+        ],
+    )
+
+
+def setup_logging() -> None:
+    """Configura el logging: los hilos que loguean solo encolan; un hilo aparte escribe"""
+    global _listener, _queue_handler, _sample_rates
+    if _listener is not None:
+        return
+
+    _sample_rates = sorted(settings.log_sample_rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    output = logging.FileHandler(settings.log_file) if settings.log_file else logging.StreamHandler(sys.stderr)
+    output.setFormatter(_formatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    _queue_handler = BoundedQueueHandler(log_queue, settings.log_max_message_length)
+    _queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(getattr(logging, settings.log_level.upper()))
+
+    # Loggers de structlog pasan por el mismo pipeline
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            _add_request_id,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+    _listener = _QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Vacía la cola y detiene el hilo de escritura"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Estadísticas del pipeline de logging"""
+    if _queue_handler is None:
+        return {"enabled": False}
+    context_filter = next(f for f in _queue_handler.filters if isinstance(f, RequestContextFilter))
+    return {
+        "enabled": True,
+        "format": settings.log_format,
+        "queued": _queue_handler.queue.qsize(),
+        "queue_size": settings.log_queue_size,
+        "dropped": _queue_handler.dropped,
+        "sampled_out": context_filter.sampled_out,
+    }
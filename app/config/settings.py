@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 
 
@@ -9,14 +9,71 @@ class Settings(BaseSettings):
     app_name: str = "Mikrowisp Integration API"
     app_version: str = "1.0.0"
     debug: bool = Field(default=False, env="DEBUG")
+    # Backend JSON: "stdlib" o "orjson" (si no está instalado se usa la stdlib)
+    json_backend: str = Field(default="stdlib", env="JSON_BACKEND")
 
     # Mikrowisp API Configuration
     mikrowisp_base_url: str = Field(..., env="MIKROWISP_BASE_URL")
     mikrowisp_token: str = Field(..., env="MIKROWISP_TOKEN")
     mikrowisp_timeout: int = Field(default=30, env="MIKROWISP_TIMEOUT")
+    mikrowisp_max_connections: int = Field(default=100, env="MIKROWISP_MAX_CONNECTIONS")
+    mikrowisp_max_keepalive: int = Field(default=20, env="MIKROWISP_MAX_KEEPALIVE")
+    mikrowisp_keepalive_expiry: float = Field(default=30.0, env="MIKROWISP_KEEPALIVE_EXPIRY")
+    mikrowisp_http2: bool = Field(default=False, env="MIKROWISP_HTTP2")
+    mikrowisp_coalesce: bool = Field(default=True, env="MIKROWISP_COALESCE")
+
+    # Bulkheads por grupo de endpoints (reads, writes, monitoring)
+    bulkhead_enabled: bool = Field(default=True, env="BULKHEAD_ENABLED")
+    bulkhead_limits: Dict[str, int] = Field(
+        default={"reads": 32, "writes": 16, "monitoring": 4}, env="BULKHEAD_LIMITS"
+    )
+    bulkhead_latency_targets: Dict[str, float] = Field(
+        default={"reads": 1.0, "writes": 2.0, "monitoring": 5.0}, env="BULKHEAD_LATENCY_TARGETS"
+    )
+    bulkhead_queue_timeout: float = Field(default=10.0, env="BULKHEAD_QUEUE_TIMEOUT")
+
+    # Reintentos, circuit breaker y hedging
+    mikrowisp_retries: int = Field(default=2, env="MIKROWISP_RETRIES")
+    mikrowisp_retry_backoff_base: float = Field(default=0.2, env="MIKROWISP_RETRY_BACKOFF_BASE")
+    mikrowisp_retry_backoff_max: float = Field(default=2.0, env="MIKROWISP_RETRY_BACKOFF_MAX")
+    breaker_failure_threshold: int = Field(default=5, env="BREAKER_FAILURE_THRESHOLD")
+    breaker_reset_timeout: float = Field(default=30.0, env="BREAKER_RESET_TIMEOUT")
+    mikrowisp_hedging: bool = Field(default=False, env="MIKROWISP_HEDGING")
+    mikrowisp_hedge_min_samples: int = Field(default=20, env="MIKROWISP_HEDGE_MIN_SAMPLES")
+
+    # Consultas masivas
+    batch_max_items: int = Field(default=500, env="BATCH_MAX_ITEMS")
+    batch_concurrency: int = Field(default=10, env="BATCH_CONCURRENCY")
+
+    # Exportación de facturas
+    invoice_page_size: int = Field(default=500, env="INVOICE_PAGE_SIZE")
+
+    # Analítica de cartera ("mirror" = espejo local, "mikrowisp" = API)
+    invoice_analytics_source: str = Field(default="mirror", env="INVOICE_ANALYTICS_SOURCE")
+    invoice_analytics_ttl: int = Field(default=300, env="INVOICE_ANALYTICS_TTL")
+
+    # Campañas de SMS
+    sms_campaign_max_recipients: int = Field(default=10000, env="SMS_CAMPAIGN_MAX_RECIPIENTS")
+    sms_campaign_concurrency: int = Field(default=5, env="SMS_CAMPAIGN_CONCURRENCY")
+    sms_campaign_rate: float = Field(default=10.0, env="SMS_CAMPAIGN_RATE")
 
     # Database Configuration
     database_url: str = Field(..., env="DATABASE_URL")
+    database_pool_size: int = Field(default=5, env="DATABASE_POOL_SIZE")
+
+    # Sincronización del espejo local
+    sync_batch_size: int = Field(default=500, env="SYNC_BATCH_SIZE")
+    sync_concurrency: int = Field(default=10, env="SYNC_CONCURRENCY")
+    sync_client_scan_chunk: int = Field(default=200, env="SYNC_CLIENT_SCAN_CHUNK")
+    sync_client_max_gap: int = Field(default=1000, env="SYNC_CLIENT_MAX_GAP")
+    # Clientes ya copiados que se vuelven a traer en cada sincronización incremental (los más antiguos)
+    sync_client_refresh_batch: int = Field(default=500, env="SYNC_CLIENT_REFRESH_BATCH")
+
+    # Índice de clientes en memoria
+    client_index_enabled: bool = Field(default=True, env="CLIENT_INDEX_ENABLED")
+    client_index_refresh_interval: int = Field(default=60, env="CLIENT_INDEX_REFRESH_INTERVAL")
+    client_index_phone_digits: int = Field(default=9, env="CLIENT_INDEX_PHONE_DIGITS")
+    client_index_min_similarity: float = Field(default=0.3, env="CLIENT_INDEX_MIN_SIMILARITY")
 
     # OpenAI Configuration
     openai_api_key: str = Field(..., env="OPENAI_API_KEY")
@@ -29,18 +86,126 @@ class Settings(BaseSettings):
     # Redis Configuration
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
 
+    # Cache de respuestas de Mikrowisp
+    cache_enabled: bool = Field(default=True, env="CACHE_ENABLED")
+    cache_max_entries: int = Field(default=10000, env="CACHE_MAX_ENTRIES")
+    cache_stale_ttl: int = Field(default=30, env="CACHE_STALE_TTL")
+    cache_redis_enabled: bool = Field(default=False, env="CACHE_REDIS_ENABLED")
+    cache_ttls: Dict[str, int] = Field(default_factory=dict, env="CACHE_TTLS")
+
     # RabbitMQ Configuration
     rabbitmq_url: str = Field(..., env="RABBITMQ_URL")
     rabbitmq_queue: str = Field(default="mikrowisp_messages", env="RABBITMQ_QUEUE")
+    # Prefetch de la cola de entrada (el worker solo enruta desde ella a los carriles) y límite por tipo
+    worker_concurrency: int = Field(default=32, env="WORKER_CONCURRENCY")
+    worker_type_concurrency: Dict[str, int] = Field(
+        default_factory=lambda: {"client_query": 32, "auto_sms": 16, "payment_reminder": 8, "sync_data": 1},
+        env="WORKER_TYPE_CONCURRENCY"
+    )
+    worker_drain_timeout: float = Field(default=30.0, env="WORKER_DRAIN_TIMEOUT")
+    # Carriles de prioridad: cola propia por carril con su presupuesto de concurrencia (prefetch)
+    worker_lanes: Dict[str, int] = Field(
+        default_factory=lambda: {"interactive": 32, "standard": 16, "bulk": 2}, env="WORKER_LANES"
+    )
+    worker_lane_by_type: Dict[str, str] = Field(
+        default_factory=lambda: {
+            "client_query": "interactive",
+            "auto_sms": "standard",
+            "payment_reminder": "standard",
+            "sync_data": "bulk",
+        },
+        env="WORKER_LANE_BY_TYPE"
+    )
+    worker_default_lane: str = Field(default="standard", env="WORKER_DEFAULT_LANE")
+    # Reintentos con espera (segundos por nivel) y dead-letter queue al agotar los intentos
+    worker_retry_delays: List[int] = Field(default_factory=lambda: [5, 30, 300], env="WORKER_RETRY_DELAYS")
+    worker_max_attempts: int = Field(default=4, env="WORKER_MAX_ATTEMPTS")
+    # Deduplicación por message_id o hash del envío (Redis, o SQLite local como respaldo).
+    # WORKER_DEDUP_CONTENT_TTL aplica a mensajes sin message_id, timestamp ni correlation_id
+    worker_dedup_enabled: bool = Field(default=True, env="WORKER_DEDUP_ENABLED")
+    worker_dedup_backend: str = Field(default="redis", env="WORKER_DEDUP_BACKEND")
+    worker_dedup_sqlite_path: str = Field(default="worker_dedup.sqlite3", env="WORKER_DEDUP_SQLITE_PATH")
+    worker_dedup_types: List[str] = Field(
+        default_factory=lambda: ["auto_sms", "payment_reminder"], env="WORKER_DEDUP_TYPES"
+    )
+    worker_dedup_ttl: int = Field(default=86400, env="WORKER_DEDUP_TTL")
+    worker_dedup_content_ttl: int = Field(default=300, env="WORKER_DEDUP_CONTENT_TTL")
+    worker_dedup_lease: int = Field(default=900, env="WORKER_DEDUP_LEASE")
+    worker_dedup_local_entries: int = Field(default=10000, env="WORKER_DEDUP_LOCAL_ENTRIES")
+
+    # Supervisor de workers (supervisor.py): 0 procesos = uno por CPU
+    supervisor_workers: int = Field(default=0, env="SUPERVISOR_WORKERS")
+    supervisor_host: str = Field(default="127.0.0.1", env="SUPERVISOR_HOST")
+    supervisor_port: int = Field(default=9101, env="SUPERVISOR_PORT")
+    supervisor_report_interval: float = Field(default=5.0, env="SUPERVISOR_REPORT_INTERVAL")
+    supervisor_restart_backoff_base: float = Field(default=1.0, env="SUPERVISOR_RESTART_BACKOFF_BASE")
+    supervisor_restart_backoff_max: float = Field(default=60.0, env="SUPERVISOR_RESTART_BACKOFF_MAX")
+    # Un hijo sin reportes por SUPERVISOR_STALE_AFTER s o desconectado de RabbitMQ por
+    # SUPERVISOR_DISCONNECTED_GRACE s se considera degradado y se reinicia
+    supervisor_stale_after: float = Field(default=30.0, env="SUPERVISOR_STALE_AFTER")
+    supervisor_disconnected_grace: float = Field(default=60.0, env="SUPERVISOR_DISCONNECTED_GRACE")
 
     # JWT Configuration
     jwt_secret_key: str = Field(..., env="JWT_SECRET_KEY")
     jwt_algorithm: str = Field(default="HS256", env="JWT_ALGORITHM")
     jwt_expiration: int = Field(default=3600, env="JWT_EXPIRATION")
+    # Cache de tokens verificados (cada entrada vence en el exp del token)
+    jwt_cache_enabled: bool = Field(default=True, env="JWT_CACHE_ENABLED")
+    jwt_cache_max_entries: int = Field(default=10000, env="JWT_CACHE_MAX_ENTRIES")
+    # Tokens revocados por /auth/logout: redis (compartidos entre workers por pub/sub, con
+    # relectura completa cada JWT_REVOCATION_SYNC_INTERVAL s) o memory (solo en proceso)
+    jwt_revocation_backend: str = Field(default="redis", env="JWT_REVOCATION_BACKEND")
+    jwt_revocation_sync_interval: float = Field(default=30.0, env="JWT_REVOCATION_SYNC_INTERVAL")
+
+    # Credenciales (bcrypt en un pool de hilos acotado, con límite de logins simultáneos)
+    auth_bcrypt_rounds: int = Field(default=12, env="AUTH_BCRYPT_ROUNDS")
+    auth_hash_workers: int = Field(default=2, env="AUTH_HASH_WORKERS")
+    auth_login_concurrency: int = Field(default=4, env="AUTH_LOGIN_CONCURRENCY")
+    auth_login_queue_timeout: float = Field(default=5.0, env="AUTH_LOGIN_QUEUE_TIMEOUT")
+    auth_bootstrap_admin_password: Optional[str] = Field(default=None, env="AUTH_BOOTSTRAP_ADMIN_PASSWORD")
+    auth_bootstrap_admin_email: str = Field(default="admin@mikrowisp.com", env="AUTH_BOOTSTRAP_ADMIN_EMAIL")
+
+    # Rate limiting por token bucket: clave = sujeto del JWT (o IP) + grupo de rutas.
+    # RATE_LIMIT_RULES: prefijo de ruta -> {"rate": tokens/s, "burst": tamaño del bucket}
+    rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
+    rate_limit_backend: str = Field(default="memory", env="RATE_LIMIT_BACKEND")
+    rate_limit_max_keys: int = Field(default=100000, env="RATE_LIMIT_MAX_KEYS")
+    rate_limit_rules: Dict[str, Dict[str, float]] = Field(
+        default_factory=lambda: {
+            "default": {"rate": 10, "burst": 40},
+            "/auth/login": {"rate": 0.2, "burst": 5},
+            "/auth/register": {"rate": 0.05, "burst": 3},
+            "/api/v1/messaging": {"rate": 1, "burst": 10},
+            "/api/v1/clients/batch": {"rate": 0.5, "burst": 5},
+            "/api/v1/invoices/export": {"rate": 0.1, "burst": 2},
+        },
+        env="RATE_LIMIT_RULES"
+    )
+    rate_limit_exempt: List[str] = Field(
+        default_factory=lambda: ["/health", "/metrics", "/docs", "/redoc", "/openapi.json"],
+        env="RATE_LIMIT_EXEMPT"
+    )
+    # IPs o redes de los proxies (nginx) cuyo X-Forwarded-For/X-Real-IP identifica al cliente
+    rate_limit_trusted_proxies: List[str] = Field(
+        default_factory=lambda: ["127.0.0.1", "::1"], env="RATE_LIMIT_TRUSTED_PROXIES"
+    )
 
     # Logging Configuration
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_file: Optional[str] = Field(default=None, env="LOG_FILE")
+    log_format: str = Field(default="json", env="LOG_FORMAT")
+    log_queue_size: int = Field(default=10000, env="LOG_QUEUE_SIZE")
+    log_max_message_length: int = Field(default=4096, env="LOG_MAX_MESSAGE_LENGTH")
+    # Fracción de logs de éxito (< WARNING) que se conservan; por prefijo de ruta en LOG_SAMPLE_RATES
+    log_sample_rate: float = Field(default=1.0, env="LOG_SAMPLE_RATE")
+    log_sample_rates: Dict[str, float] = Field(default_factory=dict, env="LOG_SAMPLE_RATES")
+
+    # Métricas Prometheus (directorio compartido para uvicorn/gunicorn con varios workers)
+    metrics_enabled: bool = Field(default=True, env="METRICS_ENABLED")
+    prometheus_multiproc_dir: Optional[str] = Field(default=None, env="PROMETHEUS_MULTIPROC_DIR")
+
+    # Header Server-Timing con el desglose de tiempos (auth, Mikrowisp, OpenAI, N8N, render)
+    server_timing_enabled: bool = Field(default=False, env="SERVER_TIMING_ENABLED")
 
     class Config:
         env_file = ".env"
@@ -1,16 +1,201 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import time
 import logging
 
 from app.config.settings import settings
+from app.services import metrics
+from app.utils.server_timing import span
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
+class TokenCache:
+    """LRU acotado de claims de tokens ya verificados.
+
+    La clave es el SHA-256 del token (el token no se guarda) y cada
+    entrada vence en el ``exp`` del propio token. Un token con ``nbf`` aún
+    no alcanzado no se sirve del cache. La revocación no depende del cache:
+    la maneja ``RevocationList``.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """Claims cacheados, o None si no hay entrada o el token ya expiró"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            claims, expires_at = entry
+            not_before = claims.get("nbf")
+            if time.time() < expires_at and not (isinstance(not_before, (int, float)) and time.time() < not_before):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.JWT_CACHE_HIT.inc()
+                return claims
+            del self._entries[key]
+        self.misses += 1
+        metrics.JWT_CACHE_MISS.inc()
+        return None
+
+    def set(self, key: bytes, claims: Dict[str, Any]) -> None:
+        expires_at = claims.get("exp")
+        # Sin exp no hay un vencimiento seguro: no se cachea
+        if not isinstance(expires_at, (int, float)):
+            return
+        self._entries[key] = (claims, float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: bytes) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Prefijo de las revocaciones en Redis y canal por el que se anuncian a los demás procesos
+_REVOKED_PREFIX = "mkw:jwt:revoked:"
+_REVOKED_CHANNEL = "mkw:jwt:revocations"
+
+
+class RevocationList:
+    """Tokens revocados antes de su ``exp``, compartidos entre procesos.
+
+    La consulta es siempre en memoria. Con ``jwt_revocation_backend=redis``
+    cada revocación se guarda como clave con TTL igual al tiempo que le
+    queda al token y se anuncia por pub/sub; cada proceso la agrega a su
+    copia local al recibirla y, además, relee todas las claves cada
+    ``jwt_revocation_sync_interval`` segundos y al reconectar, para no
+    depender de un mensaje perdido.
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+        self._local: Dict[bytes, float] = {}
+        self.synced_at: Optional[float] = None
+        self.redis_errors = 0
+
+    async def startup(self) -> None:
+        """Conecta Redis si el backend configurado es redis y empieza a escuchar revocaciones"""
+        if settings.jwt_revocation_backend != "redis" or self._redis is not None:
+            return
+        try:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+            await self._redis.ping()
+            await self._sync()
+            self._task = asyncio.create_task(self._listen())
+            logger.info("Revocación de tokens con backend Redis")
+        except Exception as e:
+            logger.warning(f"Redis no disponible para revocación de tokens, se revocan solo en proceso: {e}")
+            self._redis = None
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def _add(self, key: bytes, expires_at: float) -> None:
+        now = time.time()
+        if expires_at > now:
+            self._local[key] = expires_at
+        for revoked_key in [k for k, exp in self._local.items() if exp <= now]:
+            del self._local[revoked_key]
+
+    def _apply(self, message: str) -> None:
+        """Aplica un anuncio ``<digest hex>:<exp>`` recibido por pub/sub"""
+        digest, _, expires_at = message.partition(":")
+        try:
+            self._add(bytes.fromhex(digest), float(expires_at))
+        except ValueError:
+            logger.warning(f"Anuncio de revocación inválido: {message!r}")
+
+    async def _sync(self) -> None:
+        """Relee todas las revocaciones vigentes de Redis"""
+        keys = [key async for key in self._redis.scan_iter(match=f"{_REVOKED_PREFIX}*", count=500)]
+        values = await self._redis.mget(keys) if keys else []
+        for key, expires_at in zip(keys, values):
+            if expires_at is not None:
+                self._apply(f"{key[len(_REVOKED_PREFIX):]}:{expires_at}")
+        self.synced_at = time.time()
+
+    async def _listen(self) -> None:
+        interval = settings.jwt_revocation_sync_interval
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(_REVOKED_CHANNEL)
+                # Releer tras suscribirse: lo revocado mientras no se escuchaba no se pierde
+                await self._sync()
+                next_sync = time.monotonic() + interval
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self._apply(message["data"])
+                    if time.monotonic() >= next_sync:
+                        await self._sync()
+                        next_sync = time.monotonic() + interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Error escuchando revocaciones de tokens, reintentando: {e}")
+                await asyncio.sleep(min(interval, 5))
+            finally:
+                await pubsub.close()
+
+    async def revoke(self, key: bytes, expires_at: float) -> None:
+        """Revoca el token hasta ``expires_at``; propaga el error si Redis no lo registró"""
+        self._add(key, expires_at)
+        if self._redis is not None:
+            ttl = max(1, int(expires_at - time.time()) + 1)
+            await self._redis.set(f"{_REVOKED_PREFIX}{key.hex()}", expires_at, ex=ttl)
+            await self._redis.publish(_REVOKED_CHANNEL, f"{key.hex()}:{expires_at}")
+
+    def is_revoked(self, key: bytes) -> bool:
+        expires_at = self._local.get(key)
+        return expires_at is not None and time.time() < expires_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self._redis is not None else "memory",
+            "local_entries": len(self._local),
+            "synced_at": self.synced_at,
+            "redis_errors": self.redis_errors,
+        }
+
+
 class AuthService:
     """Servicio de autenticación JWT"""
 
@@ -18,6 +203,8 @@ class AuthService:
         self.secret_key = settings.jwt_secret_key
         self.algorithm = settings.jwt_algorithm
         self.expiration = settings.jwt_expiration
+        self.token_cache = TokenCache(settings.jwt_cache_max_entries) if settings.jwt_cache_enabled else None
+        self.revocations = RevocationList()
 
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
         """Crea un token JWT"""
@@ -32,7 +219,29 @@ class AuthService:
         return encoded_jwt
 
     def verify_token(self, token: str) -> dict:
-        """Verifica y decodifica un token JWT"""
+        """Verifica un token JWT y que no haya sido revocado (consulta en memoria)"""
+        key = TokenCache.digest(token)
+        if self.revocations.is_revoked(key):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token revocado",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return self.decode_token(token, key)
+
+    def decode_token(self, token: str, key: Optional[bytes] = None) -> dict:
+        """Valida firma, exp y nbf de un token JWT (con cache de tokens ya verificados).
+
+        No consulta revocaciones: para autenticar una petición usar ``verify_token``.
+        """
+        if self.token_cache is None:
+            key = None
+        else:
+            key = key or TokenCache.digest(token)
+            claims = self.token_cache.get(key)
+            if claims is not None:
+                return dict(claims)
+
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
             username: str = payload.get("sub")
@@ -42,6 +251,8 @@ class AuthService:
                     detail="Token inválido",
                     headers={"WWW-Authenticate": "Bearer"},
                 )
+            if key is not None:
+                self.token_cache.set(key, dict(payload))
             return payload
         except JWTError:
             raise HTTPException(
@@ -50,6 +261,27 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+    async def revoke_token(self, token: str) -> None:
+        """Revoca un token antes de su expiración (en todos los procesos si hay Redis)"""
+        try:
+            claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError:
+            # Un token inválido o expirado ya es rechazado
+            return
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            expires_at = time.time() + self.expiration
+        key = TokenCache.digest(token)
+        if self.token_cache is not None:
+            self.token_cache.discard(key)
+        await self.revocations.revoke(key, float(expires_at))
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas del cache de tokens y de las revocaciones"""
+        if self.token_cache is None:
+            return {"enabled": False, "revocations": self.revocations.stats()}
+        return {"enabled": True, **self.token_cache.stats(), "revocations": self.revocations.stats()}
+
 
 auth_service = AuthService()
 
@@ -57,7 +289,8 @@ auth_service = AuthService()
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependencia para obtener el usuario actual"""
     try:
-        payload = auth_service.verify_token(credentials.credentials)
+        with span("auth"):
+            payload = auth_service.verify_token(credentials.credentials)
         return payload
     except HTTPException:
         raise
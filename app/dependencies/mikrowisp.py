@@ -1,46 +1,31 @@
 from fastapi import HTTPException, status
+from fastapi.responses import Response
 from typing import Dict, Any
 import logging
 
-logger = logging.getLogger(__name__)
-
+from app.utils import json_codec
+from app.utils.mikrowisp_response import validate_mikrowisp_response
 
-def validate_mikrowisp_response(response: Dict[str, Any]) -> None:
-    """Valida la respuesta de Mikrowisp y lanza excepción si hay error"""
-
-    if not isinstance(response, dict):
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Respuesta inválida de Mikrowisp"
-        )
+logger = logging.getLogger(__name__)
 
-    estado = response.get("estado", "").lower()
 
-    if estado != "exito":
-        mensaje = response.get("mensaje", "Error desconocido en Mikrowisp")
-        logger.warning(f"Error en Mikrowisp: {mensaje}")
+def passthrough_response(raw) -> Response:
+    """Devuelve el cuerpo crudo de Mikrowisp sin decodificarlo ni volver a serializarlo.
 
-        # Mapear errores específicos de Mikrowisp a códigos HTTP apropiados
-        if "no encontrado" in mensaje.lower():
+    Solo si la verificación barata del ``estado`` falla se decodifica la
+    respuesta para traducir el error como ``validate_mikrowisp_response``.
+    """
+    if not raw.ok:
+        try:
+            response = json_codec.loads(raw.body)
+        except json_codec.JSONDecodeError:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=mensaje
-            )
-        elif "ya existe" in mensaje.lower():
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=mensaje
-            )
-        elif "inválido" in mensaje.lower() or "incorrecto" in mensaje.lower():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=mensaje
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=mensaje
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Respuesta inválida de Mikrowisp"
             )
+        validate_mikrowisp_response(response)
+
+    return Response(content=raw.body, media_type="application/json")
 
 
 def validate_client_permissions(client_id: int, current_user: Dict[str, Any]) -> None:
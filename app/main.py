@@ -1,21 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 import logging
+import time
 import uvicorn
 from contextlib import asynccontextmanager
 
 from app.config.settings import settings
+from app.config.logging import setup_logging, logging_stats
 from app.middleware.logging import LoggingMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.server_timing import ServerTimingMiddleware
 from app.routers import clients, invoices, tickets, messaging, monitoring
 from app.routers.auth import router as auth_router
-
-# Configurar logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename=settings.log_file if settings.log_file else None
-)
+from app.services.mikrowisp_client import mikrowisp_client
+from app.services.cache import response_cache
+from app.services.client_index import client_index
+from app.services.invoice_analytics import invoice_analytics
+from app.services.metrics import render_metrics
+from app.dependencies.auth import auth_service
+from app.services.credential_store import credential_store
+from app.services.rate_limit import rate_limiter
+from app.utils.json_codec import FastJSONResponse
+
+# Configurar logging (cola en memoria + hilo de escritura)
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +35,28 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Iniciando Mikrowisp Integration API...")
     logger.info(f"Conectando a Mikrowisp: {settings.mikrowisp_base_url}")
+    await mikrowisp_client.startup()
+    await response_cache.startup()
+    await rate_limiter.startup()
+    await auth_service.revocations.startup()
+    if settings.client_index_enabled:
+        await client_index.start()
+    try:
+        await credential_store.bootstrap_admin()
+    except Exception as e:
+        logger.error(f"No se pudo inicializar el almacén de credenciales: {e}")
 
     yield
 
     # Shutdown
     logger.info("Cerrando Mikrowisp Integration API...")
+    await mikrowisp_client.shutdown()
+    await response_cache.shutdown()
+    await rate_limiter.shutdown()
+    await auth_service.revocations.shutdown()
+    await client_index.stop()
+    await invoice_analytics.stop()
+    credential_store.shutdown()
 
 
 # Crear aplicación FastAPI
@@ -40,9 +66,14 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Rate limiting dentro de CORS: los 429 llevan headers CORS y los preflight no consumen tokens
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -52,7 +83,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Añadir middleware de logging
+# Añadir middleware de Server-Timing, métricas y logging
+if settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
 app.add_middleware(LoggingMiddleware)
 
 
@@ -60,7 +95,7 @@ app.add_middleware(LoggingMiddleware)
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Manejador personalizado de excepciones HTTP"""
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "detail": exc.detail,
@@ -76,7 +111,7 @@ async def general_exception_handler(request, exc):
     request_id = getattr(request.state, 'request_id', 'unknown')
     logger.error(f"[{request_id}] Excepción no controlada: {str(exc)}")
 
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content={
             "detail": "Error interno del servidor",
@@ -102,10 +137,28 @@ async def health_check():
         "status": "healthy",
         "service": "Mikrowisp Integration API",
         "version": "1.0.0",
-        "mikrowisp_url": settings.mikrowisp_base_url
+        "mikrowisp_url": settings.mikrowisp_base_url,
+        "mikrowisp_pool": mikrowisp_client.pool_stats(),
+        "mikrowisp_coalescing": mikrowisp_client.coalescing_stats(),
+        "mikrowisp_bulkheads": mikrowisp_client.bulkhead_stats(),
+        "mikrowisp_resilience": mikrowisp_client.resilience_stats(),
+        "cache": response_cache.stats(),
+        "client_index": client_index.stats(),
+        "jwt_cache": auth_service.cache_stats(),
+        "logins": credential_store.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "logging": logging_stats()
     }
 
 
+if settings.metrics_enabled:
+    @app.get("/metrics", tags=["Sistema"], include_in_schema=False)
+    async def metrics():
+        """Métricas en formato Prometheus"""
+        content, content_type = render_metrics()
+        return Response(content=content, media_type=content_type)
+
+
 # Endpoint para procesar mensajes (equivalente al endpoint original)
 @app.post("/mensajes/procesar", tags=["Mensajería"])
 async def process_messages(request_data: dict):
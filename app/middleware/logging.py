@@ -1,60 +1,89 @@
-from fastapi import Request, Response
-from fastapi.responses import JSONResponse
 import time
 import logging
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.logging import bind_request, log_sampled_var, unbind_request
+from app.utils.json_codec import FastJSONResponse
 
 logger = logging.getLogger(__name__)
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware para logging de peticiones HTTP"""
+class LoggingMiddleware:
+    """Middleware ASGI para logging de peticiones HTTP.
 
-    async def dispatch(self, request: Request, call_next):
-        # Generar ID único para la petición
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+    Envuelve ``send`` en lugar de usar ``BaseHTTPMiddleware``: no crea
+    tareas ni streams intermedios, y las respuestas en streaming pasan
+    chunk a chunk sin acumularse. El tiempo se registra al enviar el
+    último chunk del cuerpo.
+    """
 
-        # Log de petición entrante
-        start_time = time.time()
-        logger.info(
-            f"[{request_id}] {request.method} {request.url.path} - "
-            f"Client: {request.client.host if request.client else 'unknown'}"
-        )
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        try:
-            # Procesar petición
-            response = await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-            # Calcular tiempo de procesamiento
-            process_time = time.time() - start_time
+        # Generar ID único para la petición (accesible como request.state.request_id)
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        header = (b"x-request-id", request_id.encode("latin-1"))
+        # El request id viaja en un contextvar hacia todos los logs de la petición
+        tokens = bind_request(request_id, scope["path"])
+        log_info = log_sampled_var.get() and logger.isEnabledFor(logging.INFO)
 
-            # Log de respuesta
+        # Log de petición entrante
+        start_time = time.perf_counter()
+        if log_info:
+            client = scope.get("client")
             logger.info(
-                f"[{request_id}] {response.status_code} - "
-                f"Processed in {process_time:.4f}s"
+                f"{scope['method']} {scope['path']} - "
+                f"Client: {client[0] if client else 'unknown'}"
             )
 
-            # Añadir header con request ID
-            response.headers["X-Request-ID"] = request_id
+        status_code = 500
+        response_started = False
 
-            return response
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                # Añadir header con request ID
+                message["headers"] = list(message.get("headers", ())) + [header]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                if log_info:
+                    logger.info(
+                        f"{status_code} - "
+                        f"Processed in {time.perf_counter() - start_time:.4f}s"
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
 
         except Exception as e:
             # Log de error
-            process_time = time.time() - start_time
             logger.error(
-                f"[{request_id}] ERROR: {str(e)} - "
-                f"Failed after {process_time:.4f}s"
+                f"ERROR: {str(e)} - "
+                f"Failed after {time.perf_counter() - start_time:.4f}s"
             )
+            if response_started:
+                # Los headers ya se enviaron: no se puede responder con otro status
+                raise
 
             # Retornar respuesta de error
-            return JSONResponse(
+            response = FastJSONResponse(
                 status_code=500,
                 content={
                     "detail": "Error interno del servidor",
                     "request_id": request_id
                 },
                 headers={"X-Request-ID": request_id}
-            )
\ No newline at end of file
+            )
+            await response(scope, receive, send)
+        finally:
+            unbind_request(tokens)
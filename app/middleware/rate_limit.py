@@ -0,0 +1,113 @@
+import ipaddress
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.settings import settings
+from app.dependencies.auth import auth_service
+from app.services.metrics import rate_limit_rejections
+from app.services.rate_limit import RateLimitDecision, rate_limiter
+from app.utils.json_codec import FastJSONResponse
+
+# Proxies (IPs o redes) de los que se aceptan X-Forwarded-For y X-Real-IP
+_TRUSTED_PROXIES = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.rate_limit_trusted_proxies]
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return False
+    return any(ip in network for network in _TRUSTED_PROXIES)
+
+
+def _client_ip(scope: Scope) -> Optional[str]:
+    """IP del cliente; detrás de un proxy confiable, la que éste reporta.
+
+    En ``X-Forwarded-For`` se toma la entrada más a la derecha que no sea
+    un proxy confiable: las anteriores las escribe el propio cliente.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else None
+    if peer is None or not _is_trusted(peer):
+        return peer
+
+    forwarded_for = real_ip = None
+    for name, value in scope["headers"]:
+        if name == b"x-forwarded-for":
+            forwarded_for = value.decode("latin-1")
+        elif name == b"x-real-ip":
+            real_ip = value.decode("latin-1").strip()
+    if forwarded_for:
+        for address in reversed(forwarded_for.split(",")):
+            if address.strip() and not _is_trusted(address):
+                return address.strip()
+    return real_ip or peer
+
+
+def _identity(scope: Scope) -> str:
+    """Sujeto del JWT si el token es válido (cacheado por AuthService); si no, la IP del cliente"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    return f"user:{auth_service.decode_token(token)['sub']}"
+                except HTTPException:
+                    pass
+            break
+    return f"ip:{_client_ip(scope) or 'unknown'}"
+
+
+def _headers(decision: RateLimitDecision) -> list:
+    return [
+        (b"ratelimit-limit", str(decision.limit).encode()),
+        (b"ratelimit-remaining", str(decision.remaining).encode()),
+        (b"ratelimit-reset", str(decision.reset).encode()),
+    ]
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI de rate limiting por token bucket.
+
+    Cada petición consume un token del bucket (usuario o IP, grupo de
+    rutas); sin tokens responde 429 con ``Retry-After``. Todas las
+    respuestas limitadas llevan los headers ``RateLimit-Limit``,
+    ``RateLimit-Remaining`` y ``RateLimit-Reset``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or rate_limiter.is_exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        rule = rate_limiter.rule_for(scope["path"])
+        decision = await rate_limiter.hit(_identity(scope), rule)
+        headers = _headers(decision)
+
+        if not decision.allowed:
+            rate_limit_rejections.labels(rule.group).inc()
+            response = FastJSONResponse(
+                status_code=429,
+                content={
+                    "detail": "Demasiadas peticiones, intente más tarde",
+                    "status_code": 429,
+                    "timestamp": str(time.time())
+                },
+                headers={"Retry-After": str(decision.retry_after)}
+            )
+            response.raw_headers.extend(headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
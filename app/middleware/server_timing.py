@@ -0,0 +1,55 @@
+import time
+
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.server_timing import current_spans, end_request, format_header, start_request
+
+logger = structlog.get_logger(__name__)
+
+
+class ServerTimingMiddleware:
+    """Middleware ASGI que expone los spans de la petición en ``Server-Timing``.
+
+    El header lleva los spans registrados hasta que empieza la respuesta;
+    la línea de log al terminar incluye además lo medido durante el
+    streaming del cuerpo.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = start_request()
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = format_header(current_spans(), time.perf_counter() - start_time)
+                message["headers"] = list(message.get("headers", ())) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            total = time.perf_counter() - start_time
+            spans = end_request(token)
+            route = scope.get("route")
+            logger.info(
+                "server_timing",
+                method=scope["method"],
+                route=route.path if route is not None else scope["path"],
+                status=status_code,
+                total_ms=round(total * 1000, 2),
+                spans={name: {"ms": round(duration * 1000, 2), "calls": int(count)}
+                       for name, (duration, count) in spans.items()},
+            )
@@ -0,0 +1,56 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from sqlalchemy import BigInteger, DateTime, Integer, Numeric, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    """Base declarativa de los modelos locales"""
+    pass
+
+
+class MirrorClient(Base):
+    """Copia local de un cliente de Mikrowisp"""
+    __tablename__ = "mikrowisp_clients"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    nombre: Mapped[Optional[str]] = mapped_column(String(255))
+    cedula: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    telefono: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    movil: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    correo: Mapped[Optional[str]] = mapped_column(String(255))
+    estado: Mapped[Optional[str]] = mapped_column(String(32))
+    datos: Mapped[Dict[str, Any]] = mapped_column(JSONB)
+    synced_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class MirrorInvoice(Base):
+    """Copia local de una factura de Mikrowisp"""
+    __tablename__ = "mikrowisp_invoices"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    idcliente: Mapped[Optional[int]] = mapped_column(BigInteger, index=True)
+    estado: Mapped[Optional[str]] = mapped_column(String(32), index=True)
+    emitido: Mapped[Optional[str]] = mapped_column(String(32))
+    vencimiento: Mapped[Optional[str]] = mapped_column(String(32))
+    fechapago: Mapped[Optional[str]] = mapped_column(String(32))
+    formapago: Mapped[Optional[str]] = mapped_column(String(64))
+    total: Mapped[Optional[Decimal]] = mapped_column(Numeric(14, 2))
+    cobrado: Mapped[Optional[Decimal]] = mapped_column(Numeric(14, 2))
+    datos: Mapped[Dict[str, Any]] = mapped_column(JSONB)
+    synced_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class SyncCheckpoint(Base):
+    """Progreso de una sincronización para poder reanudarla"""
+    __tablename__ = "sync_checkpoints"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    cursor: Mapped[int] = mapped_column(BigInteger, default=0)
+    status: Mapped[str] = mapped_column(String(16), default="idle")
+    rows: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, Boolean, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.mirror import Base
+
+
+class User(Base):
+    """Usuario de la API con contraseña hasheada (bcrypt)"""
+    __tablename__ = "api_users"
+
+    username: Mapped[str] = mapped_column(String(150), primary_key=True)
+    password_hash: Mapped[str] = mapped_column(String(100))
+    email: Mapped[str] = mapped_column(String(255))
+    is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
+    client_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel
 from datetime import timedelta
 import logging
 
-from app.dependencies.auth import auth_service
+from app.dependencies.auth import auth_service, get_admin_user, get_current_user, security as bearer_security
 from app.config.settings import settings
+from app.services.credential_store import credential_store
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -31,45 +32,10 @@ class UserCreate(BaseModel):
     client_id: int = None
 
 
-# Base de datos simple en memoria (en producción usar base de datos real)
-fake_users_db = {
-    "admin": {
-        "username": "admin",
-        "password": "admin123",  # En producción, usar hash
-        "email": "admin@mikrowisp.com",
-        "is_admin": True,
-        "client_id": None
-    },
-    "demo": {
-        "username": "demo",
-        "password": "demo123",
-        "email": "demo@mikrowisp.com",
-        "is_admin": False,
-        "client_id": 1
-    }
-}
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica contraseña (simplificado para demo)"""
-    # En producción usar bcrypt o similar
-    return plain_password == hashed_password
-
-
-def authenticate_user(username: str, password: str):
-    """Autentica usuario"""
-    user = fake_users_db.get(username)
-    if not user:
-        return False
-    if not verify_password(password, user["password"]):
-        return False
-    return user
-
-
 @router.post("/login", response_model=TokenResponse)
 async def login(credentials: HTTPBasicCredentials = Depends(security)):
     """Endpoint de login que retorna JWT token"""
-    user = authenticate_user(credentials.username, credentials.password)
+    user = await credential_store.authenticate(credentials.username, credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -97,24 +63,36 @@ async def login(credentials: HTTPBasicCredentials = Depends(security)):
     }
 
 
-@router.post("/register", response_model=dict)
-async def register_user(user_data: UserCreate):
-    """Registra un nuevo usuario (solo para demo)"""
-    if user_data.username in fake_users_db:
+@router.post("/logout", response_model=dict)
+async def logout(
+        credentials: HTTPAuthorizationCredentials = Depends(bearer_security),
+        current_user: dict = Depends(get_current_user)
+):
+    """Revoca el token actual antes de su expiración"""
+    try:
+        await auth_service.revoke_token(credentials.credentials)
+    except Exception as e:
+        logger.error(f"No se pudo revocar el token de {current_user['sub']}: {str(e)}")
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="El usuario ya existe"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No se pudo cerrar la sesión, intente nuevamente"
         )
+    logger.info(f"Usuario {current_user['sub']} cerró sesión")
+    return {"message": "Sesión cerrada exitosamente"}
 
-    fake_users_db[user_data.username] = {
-        "username": user_data.username,
-        "password": user_data.password,  # En producción, hashear
-        "email": user_data.email,
-        "is_admin": user_data.is_admin,
-        "client_id": user_data.client_id
-    }
 
-    logger.info(f"Usuario {user_data.username} registrado exitosamente")
+@router.post("/register", response_model=dict)
+async def register_user(user_data: UserCreate, admin_user: dict = Depends(get_admin_user)):
+    """Registra un nuevo usuario (solo administradores)"""
+    await credential_store.create_user(
+        username=user_data.username,
+        password=user_data.password,
+        email=user_data.email,
+        is_admin=user_data.is_admin,
+        client_id=user_data.client_id
+    )
+
+    logger.info(f"Usuario {user_data.username} registrado por {admin_user['sub']}")
 
     return {"message": "Usuario registrado exitosamente"}
 
@@ -6,11 +6,16 @@ import logging
 from app.schemas.client import (
     ClientCreate, ClientUpdate, ClientResponse, ClientListFilters,
     PreRegistrationCreate, PreRegistrationFilters, ActivateClientRequest,
-    MikrowispResponse
+    MikrowispResponse, ClientBatchRequest
 )
+from app.config.settings import settings
 from app.services.mikrowisp_client import mikrowisp_client
+from app.services.concurrency import iter_bounded
+from app.services.client_index import client_index
+from app.services.sync_engine import sync_engine
 from app.dependencies.auth import get_current_user
-from app.dependencies.mikrowisp import validate_mikrowisp_response
+from app.dependencies.mikrowisp import passthrough_response
+from app.utils.mikrowisp_response import validate_mikrowisp_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/clients", tags=["Clientes"])
@@ -36,6 +41,62 @@ async def create_client(
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
+@router.post("/batch", response_model=dict)
+async def get_clients_batch(
+        batch: ClientBatchRequest,
+        current_user=Depends(get_current_user)
+):
+    """Obtiene detalles de varios clientes con concurrencia limitada
+
+    Los errores se reportan por elemento; un cliente no encontrado no hace
+    fallar la consulta completa.
+    """
+    lookups = [("id", client_id) for client_id in dict.fromkeys(batch.ids)]
+    lookups += [("cedula", cedula) for cedula in dict.fromkeys(batch.cedulas)]
+
+    if len(lookups) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.batch_max_items} clientes por consulta"
+        )
+
+    async def fetch(lookup):
+        kind, value = lookup
+        if kind == "id":
+            response = await mikrowisp_client.get_client_details(client_id=value)
+        else:
+            response = await mikrowisp_client.get_client_details(cedula=value)
+        validate_mikrowisp_response(response)
+        return response
+
+    # Se preasignan las claves para conservar el orden de la petición
+    results = {
+        "clientes": {str(value): None for kind, value in lookups if kind == "id"},
+        "cedulas": {str(value): None for kind, value in lookups if kind == "cedula"}
+    }
+    errors = 0
+    async for (kind, value), response, error in iter_bounded(lookups, fetch, settings.batch_concurrency):
+        if error is None:
+            item = response
+        else:
+            errors += 1
+            if isinstance(error, HTTPException):
+                item = {"estado": "error", "status_code": error.status_code, "mensaje": error.detail}
+            else:
+                logger.error(f"Error en consulta masiva de cliente {value}: {str(error)}")
+                item = {"estado": "error", "status_code": 500, "mensaje": "Error interno del servidor"}
+        results["clientes" if kind == "id" else "cedulas"][str(value)] = item
+
+    logger.info(f"Consulta masiva de {len(lookups)} clientes completada con {errors} errores")
+
+    return {
+        "estado": "exito",
+        "total": len(lookups),
+        "errores": errors,
+        **results
+    }
+
+
 @router.get("/{client_id}", response_model=dict)
 async def get_client_by_id(
         client_id: int,
@@ -43,10 +104,8 @@ async def get_client_by_id(
 ):
     """Obtiene detalles de un cliente por ID"""
     try:
-        response = await mikrowisp_client.get_client_details(client_id=client_id)
-        validate_mikrowisp_response(response)
-
-        return response
+        raw = await mikrowisp_client.get_client_details(client_id=client_id, raw=True)
+        return passthrough_response(raw)
 
     except HTTPException:
         raise
@@ -58,23 +117,57 @@ async def get_client_by_id(
 @router.get("/", response_model=dict)
 async def search_clients(
         cedula: Optional[str] = Query(None, description="Buscar por cédula"),
-        telefono: Optional[str] = Query(None, description="Buscar por teléfono"),
+        telefono: Optional[str] = Query(None, description="Buscar por teléfono o móvil"),
         idcliente: Optional[int] = Query(None, description="Buscar por ID"),
+        nombre: Optional[str] = Query(None, min_length=2, description="Buscar por nombre (aproximado)"),
+        limit: int = Query(20, ge=1, le=100, description="Máximo de resultados por nombre"),
         current_user=Depends(get_current_user)
 ):
-    """Busca clientes con filtros opcionales"""
+    """Busca clientes con filtros opcionales
+
+    Las búsquedas por cédula, teléfono y nombre se resuelven con el índice
+    en memoria cuando está cargado y tiene clientes; si no hay coincidencias
+    exactas se consulta a Mikrowisp. Las coincidencias del índice se
+    devuelven con el registro completo del espejo, igual que Mikrowisp.
+    """
     try:
+        if client_index.ready and len(client_index.index) and not idcliente:
+            index = client_index.index
+            if cedula:
+                matches = index.find_by_cedula(cedula)
+            elif telefono:
+                matches = index.find_by_phone(telefono)
+            elif nombre:
+                matches = index.search_name(nombre, limit)
+            else:
+                matches = []
+
+            if matches or nombre:
+                records = await sync_engine.get_clients([match["id"] for match in matches])
+                datos = [records[match["id"]] for match in matches if match["id"] in records]
+                return {"estado": "exito", "fuente": "indice", "datos": datos}
+
+        if nombre and not (cedula or telefono or idcliente):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="La búsqueda por nombre requiere el índice de clientes"
+            )
+
         filters = {}
         if cedula:
             filters["cedula"] = cedula
         if telefono:
             filters["telefono"] = telefono
         if idcliente:
-            filters["idcliente"] = idcliente
+            filters["client_id"] = idcliente
 
         response = await mikrowisp_client.get_client_details(**filters)
         validate_mikrowisp_response(response)
 
+        for item in response.get("datos") or []:
+            if isinstance(item, dict):
+                client_index.upsert(item)
+
         return response
 
     except HTTPException:
@@ -1,5 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional
+from datetime import date
+import csv
+import io
 import logging
 
 from app.schemas.invoice import (
@@ -7,8 +11,11 @@ from app.schemas.invoice import (
     InvoiceResponse, InvoiceListResponse, DeleteInvoiceRequest, DeletePaymentRequest
 )
 from app.services.mikrowisp_client import mikrowisp_client
+from app.services.invoice_analytics import invoice_analytics
 from app.dependencies.auth import get_current_user
-from app.dependencies.mikrowisp import validate_mikrowisp_response
+from app.dependencies.mikrowisp import passthrough_response
+from app.utils.mikrowisp_response import validate_mikrowisp_response
+from app.utils import json_codec
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/invoices", tags=["Facturas"])
@@ -58,10 +65,8 @@ async def list_invoices(
         if formapago:
             filters["formapago"] = formapago
 
-        response = await mikrowisp_client.get_invoices(filters)
-        validate_mikrowisp_response(response)
-
-        return response
+        raw = await mikrowisp_client.get_invoices(filters, raw=True)
+        return passthrough_response(raw)
 
     except HTTPException:
         raise
@@ -70,6 +75,107 @@ async def list_invoices(
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
+# Columnas de la exportación CSV (mismo orden que InvoiceResponse)
+EXPORT_COLUMNS = list(InvoiceResponse.__fields__)
+
+
+@router.get("/export")
+async def export_invoices(
+        formato: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson o csv"),
+        estado: Optional[int] = Query(None, description="0=Pagadas, 1=No pagadas, 2=Anuladas"),
+        idcliente: Optional[int] = Query(None, description="ID del cliente"),
+        fechapago: Optional[str] = Query(None, description="Fecha de pago YYYY-MM-DD"),
+        formapago: Optional[str] = Query(None, description="Forma de pago"),
+        current_user=Depends(get_current_user)
+):
+    """Exporta todas las facturas paginando internamente y transmitiendo el resultado
+
+    Solo se mantiene en memoria una página de Mikrowisp a la vez. Si una
+    página posterior a la primera falla, el NDJSON termina con una línea
+    ``{"error": ..., "exportacion_incompleta": true}`` y en ambos formatos
+    la transferencia se aborta, para que el cliente no tome el archivo
+    truncado como completo.
+    """
+    filters = {}
+    if estado is not None:
+        filters["estado"] = estado
+    if idcliente:
+        filters["idcliente"] = idcliente
+    if fechapago:
+        filters["fechapago"] = fechapago
+    if formapago:
+        filters["formapago"] = formapago
+
+    pages = mikrowisp_client.iter_invoice_pages(filters)
+
+    # Se obtiene la primera página antes de responder para poder devolver errores con su código HTTP
+    try:
+        first_page = await pages.__anext__()
+    except StopAsyncIteration:
+        first_page = []
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al exportar facturas: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+    async def all_pages():
+        if first_page:
+            yield first_page
+            try:
+                async for page in pages:
+                    yield page
+            except Exception as e:
+                logger.error(f"Exportación de facturas interrumpida: {str(e)}")
+                raise
+
+    async def ndjson_rows():
+        try:
+            async for page in all_pages():
+                yield b"".join(json_codec.dumps(invoice) + b"\n" for invoice in page)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else "Error interno del servidor"
+            yield json_codec.dumps({"error": detail, "exportacion_incompleta": True}) + b"\n"
+            raise
+
+    async def csv_rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        async for page in all_pages():
+            writer.writerows(page)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    if formato == "csv":
+        return StreamingResponse(
+            csv_rows(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=facturas.csv"}
+        )
+    return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson")
+
+
+@router.get("/analytics", response_model=dict)
+async def get_receivables_analytics(
+        fecha_corte: Optional[date] = Query(None, description="Fecha de corte YYYY-MM-DD (por defecto hoy)"),
+        idcliente: Optional[int] = Query(None, description="ID del cliente"),
+        current_user=Depends(get_current_user)
+):
+    """Antigüedad de cartera, tasa de cobro y totales por forma de pago"""
+    try:
+        return await invoice_analytics.receivables(fecha_corte, idcliente)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al calcular analítica de facturas: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+
 @router.get("/{invoice_id}", response_model=dict)
 async def get_invoice(
         invoice_id: int,
@@ -116,8 +222,7 @@ async def create_promise_payment(
 ):
     """Crea una promesa de pago"""
     try:
-        response = await mikrowisp_client._make_request(
-            "/api/v1/PromesaPago",
+        response = await mikrowisp_client.create_promise_payment(
             promise_data.dict(exclude_none=True)
         )
         validate_mikrowisp_response(response)
@@ -159,10 +264,7 @@ async def delete_payment(
 ):
     """Elimina el pago de una factura"""
     try:
-        response = await mikrowisp_client._make_request(
-            "/api/v1/DeleteTransaccion",
-            {"factura": invoice_id}
-        )
+        response = await mikrowisp_client.delete_payment(invoice_id)
         validate_mikrowisp_response(response)
 
         logger.info(f"Pago eliminado para factura: {invoice_id}")
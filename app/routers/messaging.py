@@ -1,10 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
+import json
 import logging
+import time
 
+from app.config.settings import settings
 from app.services.mikrowisp_client import mikrowisp_client
+from app.services.concurrency import RatePacer, iter_bounded
 from app.dependencies.auth import get_current_user
-from app.dependencies.mikrowisp import validate_mikrowisp_response
+from app.utils.mikrowisp_response import validate_mikrowisp_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/messaging", tags=["Mensajería"])
@@ -16,6 +22,25 @@ class SMSRequest(BaseModel):
     mensaje: str = Field(..., min_length=1, max_length=160, description="Mensaje a enviar")
 
 
+class CampaignRecipient(BaseModel):
+    """Destinatario de una campaña de SMS"""
+    idcliente: int = Field(..., description="ID del cliente")
+    mensaje: Optional[str] = Field(None, min_length=1, max_length=160, description="Mensaje personalizado")
+
+
+class SMSCampaignRequest(BaseModel):
+    """Esquema para campaña masiva de SMS"""
+    destinatarios: List[CampaignRecipient] = Field(..., min_items=1, description="Destinatarios")
+    mensaje: Optional[str] = Field(None, min_length=1, max_length=160, description="Mensaje común")
+
+    @validator("mensaje", always=True)
+    def check_messages(cls, v, values):
+        recipients = values.get("destinatarios") or []
+        if v is None and any(r.mensaje is None for r in recipients):
+            raise ValueError("Debe indicar un mensaje común o un mensaje por destinatario")
+        return v
+
+
 @router.post("/sms", response_model=dict)
 async def send_sms(
         sms_data: SMSRequest,
@@ -36,4 +61,62 @@ async def send_sms(
         raise
     except Exception as e:
         logger.error(f"Error al enviar SMS: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error interno del servidor")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+
+@router.post("/sms/campaign")
+async def send_sms_campaign(
+        campaign: SMSCampaignRequest,
+        current_user=Depends(get_current_user)
+):
+    """Envía una campaña de SMS y transmite el resultado de cada envío como NDJSON
+
+    Los envíos se ejecutan con concurrencia y tasa limitadas; cada línea se
+    emite en cuanto termina su envío y la última línea contiene el resumen.
+    """
+    if len(campaign.destinatarios) > settings.sms_campaign_max_recipients:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.sms_campaign_max_recipients} destinatarios por campaña"
+        )
+
+    pacer = RatePacer(settings.sms_campaign_rate)
+
+    async def send(recipient: CampaignRecipient):
+        await pacer.wait()
+        response = await mikrowisp_client.send_sms(
+            recipient.idcliente,
+            recipient.mensaje or campaign.mensaje
+        )
+        validate_mikrowisp_response(response)
+        return response
+
+    async def results():
+        start = time.monotonic()
+        sent = failed = 0
+        async for recipient, _, error in iter_bounded(
+                campaign.destinatarios, send, settings.sms_campaign_concurrency
+        ):
+            if error is None:
+                sent += 1
+                line = {"idcliente": recipient.idcliente, "estado": "exito"}
+            else:
+                failed += 1
+                if isinstance(error, HTTPException):
+                    line = {"idcliente": recipient.idcliente, "estado": "error", "mensaje": error.detail}
+                else:
+                    logger.error(f"Error en campaña SMS para cliente {recipient.idcliente}: {str(error)}")
+                    line = {"idcliente": recipient.idcliente, "estado": "error",
+                            "mensaje": "Error interno del servidor"}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+        elapsed = time.monotonic() - start
+        logger.info(f"Campaña SMS finalizada: {sent} enviados, {failed} fallidos en {elapsed:.2f}s")
+        yield json.dumps({"resumen": {
+            "total": len(campaign.destinatarios),
+            "enviados": sent,
+            "fallidos": failed,
+            "duracion": round(elapsed, 3)
+        }}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -4,7 +4,7 @@ import logging
 
 from app.services.mikrowisp_client import mikrowisp_client
 from app.dependencies.auth import get_current_user
-from app.dependencies.mikrowisp import validate_mikrowisp_response
+from app.dependencies.mikrowisp import passthrough_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/monitoring", tags=["Monitoreo"])
@@ -17,10 +17,8 @@ async def get_routers(
 ):
     """Obtiene información de routers"""
     try:
-        response = await mikrowisp_client.get_routers(router_id)
-        validate_mikrowisp_response(response)
-
-        return response
+        raw = await mikrowisp_client.get_routers(router_id, raw=True)
+        return passthrough_response(raw)
 
     except HTTPException:
         raise
@@ -36,10 +34,8 @@ async def get_monitoring_equipment(
 ):
     """Obtiene equipos en monitoreo"""
     try:
-        response = await mikrowisp_client.get_monitoring(equipment_id)
-        validate_mikrowisp_response(response)
-
-        return response
+        raw = await mikrowisp_client.get_monitoring(equipment_id, raw=True)
+        return passthrough_response(raw)
 
     except HTTPException:
         raise
@@ -7,7 +7,7 @@ from app.schemas.ticket import (
 )
 from app.services.mikrowisp_client import mikrowisp_client
 from app.dependencies.auth import get_current_user
-from app.dependencies.mikrowisp import validate_mikrowisp_response
+from app.utils.mikrowisp_response import validate_mikrowisp_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/tickets", tags=["Tickets"])
@@ -64,6 +64,17 @@ class ClientListFilters(BaseModel):
     telefono: Optional[str] = None
     cedula: Optional[str] = None
 
+class ClientBatchRequest(BaseModel):
+    """Esquema para consulta masiva de clientes"""
+    ids: List[int] = Field(default_factory=list, description="IDs de clientes")
+    cedulas: List[str] = Field(default_factory=list, description="Cédulas de clientes")
+
+    @validator("cedulas", always=True)
+    def check_not_empty(cls, v, values):
+        if not v and not values.get("ids"):
+            raise ValueError("Debe proporcionar al menos un ID o una cédula")
+        return v
+
 class PreRegistrationCreate(BaseModel):
     """Esquema para crear pre-registro"""
     cliente: str = Field(..., description="Nombre completo del cliente")
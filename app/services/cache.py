@@ -0,0 +1,238 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+import logging
+
+from app.config.settings import settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """Entrada del cache local"""
+
+    __slots__ = ("body", "fresh_until", "stale_until", "tags")
+
+    def __init__(self, body: bytes, fresh_until: float, stale_until: float, tags: Tuple[str, ...]):
+        self.body = body
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.tags = tags
+
+
+class ResponseCache:
+    """Cache de respuestas en dos niveles: LRU en proceso y Redis opcional.
+
+    Guarda el cuerpo crudo de la respuesta (bytes) para que cada lectura
+    decodifique su propia copia. Las entradas tienen un periodo fresco
+    (TTL) seguido de un periodo "stale" en el que se sirven mientras se
+    revalidan en segundo plano. Las etiquetas (``cliente:1``,
+    ``factura:5``) permiten invalidar por entidad tras una escritura.
+    """
+
+    def __init__(self, max_entries: int, stale_ttl: int, redis_url: Optional[str] = None,
+                 prefix: str = "mkw:cache:"):
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._redis = None
+        self.hits = 0
+        self.redis_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def startup(self) -> None:
+        """Conecta el nivel Redis si está configurado"""
+        if not self.redis_url or self._redis is not None:
+            return
+        try:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self.redis_url)
+            await self._redis.ping()
+            logger.info("Cache Redis conectado")
+        except Exception as e:
+            logger.warning(f"Cache Redis no disponible, usando solo cache local: {e}")
+            self._redis = None
+
+    async def shutdown(self) -> None:
+        """Cierra la conexión a Redis"""
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    @staticmethod
+    def make_key(endpoint: str, data: Optional[Dict[str, Any]]) -> str:
+        """Genera una clave estable a partir del endpoint y el cuerpo"""
+        canonical = json.dumps(data or {}, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+        return f"{endpoint.strip('/')}:{digest}"
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, bool]]:
+        """Retorna (cuerpo, es_fresco) o None si no hay entrada utilizable"""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.stale_until > now:
+                self._entries.move_to_end(key)
+                fresh = entry.fresh_until > now
+                if fresh:
+                    self.hits += 1
+                    metrics.CACHE_HIT.inc()
+                else:
+                    self.stale_hits += 1
+                    metrics.CACHE_STALE.inc()
+                return entry.body, fresh
+            self._drop(key)
+
+        if self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.get(self.prefix + key)
+                    pipe.pttl(self.prefix + key)
+                    value, pttl = await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error leyendo cache Redis: {e}")
+                value, pttl = None, -2
+
+            if value is not None and pttl > 0:
+                # El valor en Redis es "tag1,tag2\0<cuerpo>"; el JSON nunca contiene un NUL literal
+                raw_tags, body = value.split(b"\0", 1)
+                tags = tuple(raw_tags.decode().split(",")) if raw_tags else ()
+                # El TTL de Redis cubre fresco + stale; lo que exceda el periodo stale es fresco
+                remaining = pttl / 1000
+                fresh_for = remaining - self.stale_ttl
+                self._store_local(key, body, now + fresh_for, now + remaining, tags)
+                # Cada lectura cuenta en un solo grupo: un hit stale de Redis va solo a stale_hits
+                if fresh_for > 0:
+                    self.redis_hits += 1
+                    metrics.CACHE_REDIS_HIT.inc()
+                    return body, True
+                self.stale_hits += 1
+                metrics.CACHE_STALE.inc()
+                return body, False
+
+        self.misses += 1
+        metrics.CACHE_MISS.inc()
+        return None
+
+    async def related_tags(self, tag: str, prefix: str) -> Set[str]:
+        """Etiquetas con el prefijo dado asociadas a las entradas de una etiqueta.
+
+        Se consultan las entradas locales y, con Redis, el índice de
+        etiquetas compartido (``tag:<etiqueta>`` -> claves y ``tags:<clave>``
+        -> etiquetas), así se encuentran también las entradas que guardaron
+        otros workers.
+        """
+        related = set()
+        for key in self._tags.get(tag, ()):
+            entry = self._entries.get(key)
+            if entry is not None:
+                related.update(t for t in entry.tags if t.startswith(prefix))
+
+        if self._redis is not None:
+            try:
+                keys = await self._redis.smembers(f"{self.prefix}tag:{tag}")
+                if keys:
+                    values = await self._redis.mget([f"{self.prefix}tags:{key.decode()}" for key in keys])
+                    for value in values:
+                        if value:
+                            related.update(t for t in value.decode().split(",") if t.startswith(prefix))
+            except Exception as e:
+                logger.warning(f"Error leyendo etiquetas del cache Redis: {e}")
+        return related
+
+    async def set(self, key: str, body: bytes, ttl: int, tags: Iterable[str] = ()) -> None:
+        """Guarda una respuesta en ambos niveles"""
+        tags = tuple(tags)
+        now = time.monotonic()
+        self._store_local(key, body, now + ttl, now + ttl + self.stale_ttl, tags)
+
+        if self._redis is not None:
+            expire_ms = int((ttl + self.stale_ttl) * 1000)
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    value = ",".join(tags).encode() + b"\0" + body
+                    pipe.set(self.prefix + key, value, px=expire_ms)
+                    if tags:
+                        pipe.set(f"{self.prefix}tags:{key}", ",".join(tags), px=expire_ms)
+                    for tag in tags:
+                        tag_key = f"{self.prefix}tag:{tag}"
+                        pipe.sadd(tag_key, key)
+                        pipe.pexpire(tag_key, expire_ms)
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error escribiendo cache Redis: {e}")
+
+    async def invalidate(self, *tags: str) -> None:
+        """Elimina todas las entradas asociadas a las etiquetas dadas"""
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+
+        if self._redis is not None and tags:
+            try:
+                tag_keys = [f"{self.prefix}tag:{tag}" for tag in tags]
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for tag_key in tag_keys:
+                        pipe.smembers(tag_key)
+                    members = await pipe.execute()
+
+                keys = {self.prefix + m.decode() for group in members for m in group}
+                keys |= {f"{self.prefix}tags:{m.decode()}" for group in members for m in group}
+                await self._redis.delete(*keys, *tag_keys)
+            except Exception as e:
+                logger.warning(f"Error invalidando cache Redis: {e}")
+
+    def _store_local(self, key: str, body: bytes, fresh_until: float, stale_until: float,
+                     tags: Tuple[str, ...]) -> None:
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = CacheEntry(body, fresh_until, stale_until, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del cache"""
+        lookups = self.hits + self.redis_hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "redis": self._redis is not None,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Instancia global del cache
+response_cache = ResponseCache(
+    max_entries=settings.cache_max_entries,
+    stale_ttl=settings.cache_stale_ttl,
+    redis_url=settings.redis_url if settings.cache_redis_enabled else None
+)
@@ -0,0 +1,314 @@
+import asyncio
+import bisect
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from app.config.settings import settings
+from app.services.sync_engine import sync_engine
+
+logger = logging.getLogger(__name__)
+
+# Campos que se conservan por cliente; el resto del registro queda en Mikrowisp/espejo
+INDEX_FIELDS = ("id", "nombre", "cedula", "telefono", "movil", "correo", "estado")
+
+# Lotes hasta este tamaño se insertan uno a uno con bisect; los mayores se mezclan ordenados
+SMALL_BATCH = 1000
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]")
+_NON_DIGIT = re.compile(r"\D")
+
+
+def normalize_text(value: Any) -> str:
+    """Minúsculas, sin tildes y con espacios simples"""
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode()
+    return " ".join(text.lower().split())
+
+
+def normalize_cedula(value: Any) -> str:
+    return _NON_ALNUM.sub("", normalize_text(value))
+
+
+def normalize_phone(value: Any) -> str:
+    """Últimos N dígitos, para que "+593 99 123 4567" y "0991234567" coincidan"""
+    digits = _NON_DIGIT.sub("", str(value or "")).lstrip("0")
+    return digits[-settings.client_index_phone_digits:] if digits else ""
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ClientIndex:
+    """Índice en memoria de clientes por cédula, teléfono y nombre.
+
+    Las búsquedas exactas (cédula, teléfono/móvil) son un acceso a dict;
+    la búsqueda por nombre usa prefijos (bisect sobre nombres ordenados)
+    y trigramas para coincidencias aproximadas.
+    """
+
+    def __init__(self):
+        self.records: Dict[int, Dict[str, Any]] = {}
+        self.by_cedula: Dict[str, Set[int]] = {}
+        self.by_phone: Dict[str, Set[int]] = {}
+        self.by_trigram: Dict[str, Set[int]] = {}
+        self._names: List[Tuple[str, int]] = []
+        self._names_dirty = False
+        self._name_keys: Dict[int, str] = {}
+        self.loaded_at: Optional[float] = None
+        self.synced_until: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def upsert(self, item: Dict[str, Any], bulk: bool = False) -> None:
+        """Agrega o actualiza un cliente a partir de un registro de Mikrowisp.
+
+        Un upsert suelto inserta el nombre en su posición (``bisect.insort``).
+        Con ``bulk=True`` la lista de nombres no se toca: la rehace
+        ``prepare()`` (carga completa) o la mezcla ``apply_batch``.
+        """
+        if not item.get("id"):
+            return
+        client_id = int(item["id"])
+        if client_id in self.records:
+            self.remove(client_id, bulk)
+
+        record = {field: item.get(field) for field in INDEX_FIELDS}
+        record["id"] = client_id
+        self.records[client_id] = record
+
+        cedula = normalize_cedula(record["cedula"])
+        if cedula:
+            self.by_cedula.setdefault(cedula, set()).add(client_id)
+        for phone in {normalize_phone(record["telefono"]), normalize_phone(record["movil"])}:
+            if phone:
+                self.by_phone.setdefault(phone, set()).add(client_id)
+
+        name = normalize_text(record["nombre"])
+        if name:
+            self._name_keys[client_id] = name
+            if bulk:
+                self._names_dirty = True
+            else:
+                bisect.insort(self._sorted_names(), (name, client_id))
+            for gram in trigrams(name):
+                self.by_trigram.setdefault(gram, set()).add(client_id)
+
+    def remove(self, client_id: int, bulk: bool = False) -> None:
+        record = self.records.pop(client_id, None)
+        if record is None:
+            return
+
+        self._discard(self.by_cedula, normalize_cedula(record["cedula"]), client_id)
+        for phone in (normalize_phone(record["telefono"]), normalize_phone(record["movil"])):
+            self._discard(self.by_phone, phone, client_id)
+
+        name = self._name_keys.pop(client_id, None)
+        if name:
+            for gram in trigrams(name):
+                self._discard(self.by_trigram, gram, client_id)
+            if not bulk:
+                names = self._sorted_names()
+                position = bisect.bisect_left(names, (name, client_id))
+                if position < len(names) and names[position] == (name, client_id):
+                    del names[position]
+
+    def apply_batch(self, items: List[Dict[str, Any]]) -> None:
+        """Aplica un lote de cambios manteniendo la lista de nombres ordenada.
+
+        Los lotes chicos usan bisect por cliente; los grandes quitan las
+        entradas cambiadas en una pasada y mezclan las nuevas ya ordenadas
+        (dos tramos ordenados que timsort une en tiempo lineal).
+        """
+        if len(items) <= SMALL_BATCH:
+            for item in items:
+                self.upsert(item)
+            return
+
+        names = self._sorted_names()
+        changed = {int(item["id"]) for item in items if item.get("id")}
+        for item in items:
+            self.upsert(item, bulk=True)
+        merged = [entry for entry in names if entry[1] not in changed]
+        merged.extend(sorted(
+            (self._name_keys[client_id], client_id) for client_id in changed if client_id in self._name_keys
+        ))
+        # Dos tramos ya ordenados: timsort los mezcla en tiempo lineal
+        merged.sort()
+        self._names = merged
+        self._names_dirty = False
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[int]], key: str, client_id: int) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(client_id)
+            if not ids:
+                del index[key]
+
+    def _sorted_names(self) -> List[Tuple[str, int]]:
+        if self._names_dirty:
+            self._names = sorted((name, client_id) for client_id, name in self._name_keys.items())
+            self._names_dirty = False
+        return self._names
+
+    def prepare(self) -> None:
+        """Ordena la lista de nombres tras una carga completa, antes de publicar el índice"""
+        self._sorted_names()
+
+    def _records(self, ids: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.records[client_id] for client_id in sorted(ids) if client_id in self.records]
+
+    def find_by_cedula(self, cedula: str) -> List[Dict[str, Any]]:
+        return self._records(self.by_cedula.get(normalize_cedula(cedula), ()))
+
+    def find_by_phone(self, phone: str) -> List[Dict[str, Any]]:
+        return self._records(self.by_phone.get(normalize_phone(phone), ()))
+
+    def search_name(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Busca por prefijo y, si no alcanza, por similitud de trigramas"""
+        query = normalize_text(query)
+        if not query:
+            return []
+
+        names = self._sorted_names()
+        results: List[int] = []
+        position = bisect.bisect_left(names, (query, -1))
+        while position < len(names) and len(results) < limit and names[position][0].startswith(query):
+            results.append(names[position][1])
+            position += 1
+
+        if len(results) < limit and len(query) >= 3:
+            query_grams = trigrams(query)
+            scores: Counter = Counter()
+            for gram in query_grams:
+                scores.update(self.by_trigram.get(gram, ()))
+            seen = set(results)
+            threshold = settings.client_index_min_similarity
+            for client_id, shared in scores.most_common():
+                if len(results) >= limit:
+                    break
+                if client_id in seen:
+                    continue
+                name_grams = len(self._name_keys[client_id]) + 1
+                if shared / max(len(query_grams), name_grams) < threshold:
+                    continue
+                results.append(client_id)
+
+        return [self.records[client_id] for client_id in results]
+
+    def memory_bytes(self) -> int:
+        """Tamaño aproximado en memoria de las estructuras del índice"""
+        total = 0
+        for mapping in (self.by_cedula, self.by_phone, self.by_trigram):
+            total += sys.getsizeof(mapping)
+            for key, ids in mapping.items():
+                total += sys.getsizeof(key) + sys.getsizeof(ids)
+        total += sys.getsizeof(self.records)
+        for record in self.records.values():
+            total += sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+        total += sys.getsizeof(self._names) + sys.getsizeof(self._name_keys)
+        total += sum(sys.getsizeof(name) for name in self._name_keys.values())
+        return total
+
+
+class ClientIndexService:
+    """Carga el índice desde el espejo local y lo mantiene actualizado"""
+
+    def __init__(self):
+        self.index = ClientIndex()
+        self.ready = False
+        self._task: Optional[asyncio.Task] = None
+        self._memory_bytes = 0
+        self.last_refresh: Optional[float] = None
+
+    async def start(self) -> None:
+        """Inicia la carga y el refresco periódico en segundo plano"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not self.ready:
+                    await self.load()
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error actualizando índice de clientes: {e}")
+            await asyncio.sleep(settings.client_index_refresh_interval)
+
+    async def load(self) -> None:
+        """Construye un índice nuevo con todos los clientes y lo reemplaza"""
+        start = time.monotonic()
+        index = ClientIndex()
+        started_at = datetime.utcnow()
+        async for item in sync_engine.stream_clients():
+            index.upsert(item, bulk=True)
+        index.synced_until = started_at
+        index.loaded_at = time.time()
+        index.prepare()
+
+        self.index = index
+        self.ready = True
+        self.last_refresh = time.time()
+        self._memory_bytes = index.memory_bytes()
+        logger.info(
+            f"Índice de clientes cargado: {len(index)} clientes en {time.monotonic() - start:.2f}s "
+            f"({self._memory_bytes / 1024 / 1024:.1f} MiB)"
+        )
+
+    async def refresh(self) -> None:
+        """Aplica los clientes sincronizados desde la última actualización.
+
+        Los cambios se leen primero y se aplican sin ceder el event loop con
+        ``apply_batch``: ninguna búsqueda ve la lista desordenada ni paga un
+        ordenamiento completo.
+        """
+        started_at = datetime.utcnow()
+        items = [item async for item in sync_engine.stream_clients(since=self.index.synced_until)]
+        self.index.apply_batch(items)
+        updated = len(items)
+        self.index.synced_until = started_at
+        self.last_refresh = time.time()
+        if updated:
+            self._memory_bytes = self.index.memory_bytes()
+            logger.info(f"Índice de clientes actualizado: {updated} clientes")
+
+    def upsert(self, item: Dict[str, Any]) -> None:
+        """Agrega un cliente obtenido de Mikrowisp (p.ej. tras una búsqueda sin resultados)"""
+        if self.ready:
+            self.index.upsert(item)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "clients": len(self.index),
+            "cedulas": len(self.index.by_cedula),
+            "phones": len(self.index.by_phone),
+            "trigrams": len(self.index.by_trigram),
+            "memory_bytes": self._memory_bytes,
+            "last_refresh": self.last_refresh,
+        }
+
+
+# Instancia global del índice
+client_index = ClientIndexService()
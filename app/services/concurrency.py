@@ -0,0 +1,170 @@
+import asyncio
+import time
+from collections import deque
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple, TypeVar
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class AdaptiveLimiter:
+    """Limitador de concurrencia (bulkhead) con límite adaptativo AIMD.
+
+    Cada respuesta rápida y exitosa suma ``1/limit`` al límite (≈ +1 por
+    ventana completa); una respuesta lenta o fallida lo multiplica por
+    ``backoff``, como mucho una vez por ``latency_target`` para no
+    colapsar ante una ráfaga de errores. Los llamadores que no obtienen
+    turno esperan en cola FIFO.
+    """
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1,
+                 latency_target: float = 1.0, backoff: float = 0.8):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(max(min_limit, max_limit // 2))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self.acquired = 0
+        self.queued = 0
+        self.rejected = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """Obtiene un turno y retorna el tiempo esperado en cola (segundos)"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.acquired += 1
+            return 0.0
+
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # El turno se concedió justo al cancelar: se devuelve
+                self.in_flight -= 1
+                self._wake()
+            else:
+                future.cancel()
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+            raise
+
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.wait_time_total += waited
+        if waited > self.wait_time_max:
+            self.wait_time_max = waited
+        return waited
+
+    def release(self, latency: Optional[float] = None, success: bool = True) -> None:
+        """Libera el turno y ajusta el límite según la latencia observada.
+
+        Sin ``latency`` (p.ej. una petición cancelada) el límite no cambia.
+        """
+        self.in_flight -= 1
+
+        if latency is None:
+            pass
+        elif success and latency <= self.latency_target:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_target:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del bulkhead"""
+        return {
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "wait_time_avg": round(self.wait_time_total / self.queued, 4) if self.queued else 0.0,
+            "wait_time_max": round(self.wait_time_max, 4),
+        }
+
+
+class RatePacer:
+    """Espacia el inicio de operaciones para no superar ``rate`` por segundo"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        """Espera hasta el siguiente turno disponible"""
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def iter_bounded(
+        items: Iterable[T],
+        func: Callable[[T], Awaitable[R]],
+        limit: int
+) -> AsyncIterator[Tuple[T, Optional[R], Optional[BaseException]]]:
+    """Aplica ``func`` a cada elemento con como mucho ``limit`` tareas en vuelo.
+
+    Entrega ``(elemento, resultado, error)`` a medida que cada tarea termina;
+    los elementos se consumen de forma perezosa, así que la memoria depende
+    de ``limit`` y no del tamaño de ``items``.
+    """
+    iterator = iter(items)
+    pending: Dict[asyncio.Task, T] = {}
+
+    def fill() -> None:
+        while len(pending) < limit:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            pending[asyncio.ensure_future(func(item))] = item
+
+    fill()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                if task.cancelled():
+                    yield item, None, asyncio.CancelledError()
+                elif task.exception() is not None:
+                    yield item, None, task.exception()
+                else:
+                    yield item, task.result(), None
+            fill()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,148 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+import logging
+
+import bcrypt
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+
+from app.config.settings import settings
+from app.models.user import User
+from app.services.concurrency import AdaptiveLimiter
+from app.services.database import create_tables, get_session_factory
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialStore:
+    """Usuarios de la API con contraseñas bcrypt en la base de datos.
+
+    bcrypt tarda cientos de milisegundos por operación: se ejecuta en un
+    pool de hilos acotado (bcrypt libera el GIL) y los inicios de sesión
+    simultáneos se limitan para que una ráfaga de logins no acapare el
+    pool ni la CPU que necesita el resto de la API.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.auth_hash_workers, thread_name_prefix="bcrypt"
+        )
+        self._limiter = AdaptiveLimiter(
+            "login",
+            max_limit=settings.auth_login_concurrency,
+            min_limit=settings.auth_login_concurrency
+        )
+        self._tables_ready = False
+        self._dummy_hash: Optional[str] = None
+
+    async def _ensure_tables(self) -> None:
+        if not self._tables_ready:
+            await create_tables()
+            self._tables_ready = True
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def hash_password(self, password: str) -> str:
+        """Hashea una contraseña fuera del event loop"""
+        hashed = await self._run(
+            bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(settings.auth_bcrypt_rounds)
+        )
+        return hashed.decode("ascii")
+
+    async def verify_password(self, password: str, password_hash: str) -> bool:
+        """Verifica una contraseña contra su hash fuera del event loop"""
+        return await self._run(bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("ascii"))
+
+    async def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        await self._ensure_tables()
+        async with get_session_factory()() as session:
+            user = await session.get(User, username)
+            if user is None:
+                return None
+            return {
+                "username": user.username,
+                "password_hash": user.password_hash,
+                "email": user.email,
+                "is_admin": user.is_admin,
+                "client_id": user.client_id,
+            }
+
+    async def create_user(self, username: str, password: str, email: str,
+                          is_admin: bool = False, client_id: Optional[int] = None) -> None:
+        """Crea un usuario; lanza 409 si ya existe"""
+        await self._ensure_tables()
+        password_hash = await self.hash_password(password)
+        try:
+            async with get_session_factory()() as session:
+                session.add(User(
+                    username=username,
+                    password_hash=password_hash,
+                    email=email,
+                    is_admin=is_admin,
+                    client_id=client_id,
+                    created_at=datetime.utcnow()
+                ))
+                await session.commit()
+        except IntegrityError:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El usuario ya existe")
+
+    async def authenticate(self, username: str, password: str) -> Optional[Dict[str, Any]]:
+        """Retorna el usuario si las credenciales son válidas.
+
+        Lanza 503 si hay demasiados inicios de sesión en curso durante más
+        de ``auth_login_queue_timeout`` segundos.
+        """
+        try:
+            await self._limiter.acquire(settings.auth_login_queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Demasiados inicios de sesión simultáneos, rechazando login")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Demasiados inicios de sesión simultáneos, intente más tarde",
+                headers={"Retry-After": "1"}
+            )
+
+        try:
+            user = await self.get_user(username)
+            if user is None:
+                # Se verifica igual contra un hash ficticio para no revelar por tiempo qué usuarios existen
+                await self.verify_password(password, await self._get_dummy_hash())
+                return None
+            if not await self.verify_password(password, user["password_hash"]):
+                return None
+            return user
+        finally:
+            self._limiter.release()
+
+    async def _get_dummy_hash(self) -> str:
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash_password("dummy-password")
+        return self._dummy_hash
+
+    async def bootstrap_admin(self) -> None:
+        """Crea el usuario admin inicial si se configuró AUTH_BOOTSTRAP_ADMIN_PASSWORD"""
+        if not settings.auth_bootstrap_admin_password:
+            return
+        if await self.get_user("admin") is not None:
+            return
+        try:
+            await self.create_user(
+                "admin", settings.auth_bootstrap_admin_password, settings.auth_bootstrap_admin_email, True
+            )
+            logger.info("Usuario admin inicial creado")
+        except HTTPException:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del limitador de inicios de sesión"""
+        return self._limiter.stats()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+# Instancia global del almacén de credenciales
+credential_store = CredentialStore()
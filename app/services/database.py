@@ -0,0 +1,58 @@
+from typing import Optional
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from app.config.settings import settings
+from app.models.mirror import Base
+from app.models.user import User  # noqa: F401 - registra la tabla en Base.metadata
+
+logger = logging.getLogger(__name__)
+
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+
+
+def _async_url(url: str) -> str:
+    """Convierte DATABASE_URL al driver asyncpg"""
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    return url
+
+
+def get_engine() -> AsyncEngine:
+    """Motor async compartido por proceso"""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            _async_url(settings.database_url),
+            pool_size=settings.database_pool_size,
+            pool_pre_ping=True
+        )
+    return _engine
+
+
+def get_session_factory() -> async_sessionmaker:
+    """Fábrica de sesiones async"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(get_engine(), expire_on_commit=False)
+    return _session_factory
+
+
+async def create_tables() -> None:
+    """Crea las tablas locales si no existen"""
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def dispose_engine() -> None:
+    """Cierra el pool de conexiones"""
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _session_factory = None
+        logger.info("Conexiones a la base de datos cerradas")
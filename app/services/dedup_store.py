@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Resultado de ``claim``
+CLAIMED = "claimed"
+DONE = "done"
+IN_PROGRESS = "in_progress"
+
+_PROCESSING = "processing"
+
+
+class DedupStore:
+    """Deduplicación de mensajes del worker con marcas de completado.
+
+    ``claim`` reserva la clave con un lease (SET NX EX en Redis, INSERT en
+    SQLite); al terminar, ``complete`` la marca como hecha durante el TTL
+    de la clave y ``release`` la libera si el mensaje
+    falló, para que el reintento pueda procesarlo. Las marcas de completado
+    se guardan además en un LRU en proceso: una reentrega al mismo proceso
+    se resuelve sin salir de memoria.
+
+    SQLite se comparte entre los procesos del supervisor y puede esperar
+    por el lock del archivo: sus llamadas corren en un hilo propio para no
+    bloquear el event loop (ni los heartbeats de pika).
+    """
+
+    def __init__(self):
+        self.enabled = settings.worker_dedup_enabled
+        self._redis = None
+        self._sqlite: Optional[sqlite3.Connection] = None
+        self._sqlite_executor: Optional[ThreadPoolExecutor] = None
+        self._done: "OrderedDict[str, float]" = OrderedDict()
+        self.claimed = 0
+        self.duplicates = 0
+        self.in_progress = 0
+        self.errors = 0
+
+    @staticmethod
+    def message_key(properties, body: bytes, message_data: Dict[str, Any]) -> Tuple[str, int]:
+        """Clave que identifica un envío del mensaje y cuánto dura su marca de completado.
+
+        Se usa el ``message_id`` AMQP o el del cuerpo; si no hay, el hash del
+        cuerpo junto con el timestamp y correlation_id AMQP (una reentrega
+        conserva las propiedades, un envío nuevo no). Sin nada de eso, el
+        hash del cuerpo solo distingue envíos por tiempo, así que su marca
+        dura ``worker_dedup_content_ttl`` y no ``worker_dedup_ttl``.
+        """
+        message_id = getattr(properties, "message_id", None) or message_data.get("message_id")
+        if message_id:
+            return f"id:{message_id}", settings.worker_dedup_ttl
+        digest = hashlib.sha256(body)
+        timestamp = getattr(properties, "timestamp", None)
+        correlation_id = getattr(properties, "correlation_id", None)
+        if timestamp or correlation_id:
+            digest.update(f"|{timestamp}|{correlation_id}".encode())
+            return f"sha256:{digest.hexdigest()}", settings.worker_dedup_ttl
+        return f"body:{digest.hexdigest()}", settings.worker_dedup_content_ttl
+
+    async def startup(self) -> None:
+        """Conecta Redis o, si no está disponible, abre la base SQLite local"""
+        if not self.enabled:
+            return
+        if settings.worker_dedup_backend == "redis":
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+                await self._redis.ping()
+                logger.info("Deduplicación de mensajes con backend Redis")
+                return
+            except Exception as e:
+                logger.warning(f"Redis no disponible para deduplicación, usando SQLite: {e}")
+                self._redis = None
+
+        # Un solo hilo: serializa el uso de la conexión y nunca bloquea el loop
+        self._sqlite_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup-sqlite")
+        self._sqlite = await self._run_sqlite(self._open_sqlite)
+        logger.info(f"Deduplicación de mensajes con SQLite en {settings.worker_dedup_sqlite_path}")
+
+    @staticmethod
+    def _open_sqlite() -> sqlite3.Connection:
+        connection = sqlite3.connect(settings.worker_dedup_sqlite_path, timeout=5, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS dedup (key TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        return connection
+
+    async def _run_sqlite(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._sqlite_executor, func, *args)
+
+    async def shutdown(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+        if self._sqlite is not None:
+            await self._run_sqlite(self._sqlite.close)
+            self._sqlite = None
+        if self._sqlite_executor is not None:
+            self._sqlite_executor.shutdown(wait=False)
+            self._sqlite_executor = None
+
+    def _remember_done(self, key: str, expires_at: float) -> None:
+        self._done[key] = expires_at
+        self._done.move_to_end(key)
+        if len(self._done) > settings.worker_dedup_local_entries:
+            self._done.popitem(last=False)
+
+    async def claim(self, key: str, ttl: int) -> str:
+        """Reserva la clave; retorna ``CLAIMED``, ``DONE`` o ``IN_PROGRESS``.
+
+        Ante un error del backend se procesa igual (``CLAIMED``): es
+        preferible un duplicado eventual a detener el worker.
+        """
+        expires_at = self._done.get(key)
+        if expires_at is not None:
+            if time.time() < expires_at:
+                self.duplicates += 1
+                return DONE
+            del self._done[key]
+
+        try:
+            if self._redis is not None:
+                state = await self._claim_redis(key)
+            else:
+                state = await self._run_sqlite(self._claim_sqlite, key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error en el almacén de deduplicación, se procesa sin deduplicar: {e}")
+            return CLAIMED
+
+        if state == CLAIMED:
+            self.claimed += 1
+        elif state == DONE:
+            self.duplicates += 1
+            self._remember_done(key, time.time() + ttl)
+        else:
+            self.in_progress += 1
+        return state
+
+    async def _claim_redis(self, key: str) -> str:
+        redis_key = f"mkw:dedup:{key}"
+        if await self._redis.set(redis_key, _PROCESSING, nx=True, ex=settings.worker_dedup_lease):
+            return CLAIMED
+        return DONE if await self._redis.get(redis_key) == DONE else IN_PROGRESS
+
+    def _claim_sqlite(self, key: str) -> str:
+        now = time.time()
+        with self._sqlite:
+            self._sqlite.execute("DELETE FROM dedup WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = self._sqlite.execute(
+                "INSERT OR IGNORE INTO dedup (key, state, expires_at) VALUES (?, ?, ?)",
+                (key, _PROCESSING, now + settings.worker_dedup_lease)
+            )
+            if cursor.rowcount:
+                return CLAIMED
+            row = self._sqlite.execute("SELECT state FROM dedup WHERE key = ?", (key,)).fetchone()
+        return DONE if row and row[0] == DONE else IN_PROGRESS
+
+    async def complete(self, key: str, ttl: int) -> None:
+        """Registra la marca de completado por ``ttl`` segundos"""
+        expires_at = time.time() + ttl
+        self._remember_done(key, expires_at)
+        try:
+            if self._redis is not None:
+                await self._redis.set(f"mkw:dedup:{key}", DONE, ex=ttl)
+            elif self._sqlite is not None:
+                await self._run_sqlite(self._complete_sqlite, key, expires_at)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"No se pudo registrar el mensaje como completado: {e}")
+
+    def _complete_sqlite(self, key: str, expires_at: float) -> None:
+        with self._sqlite:
+            self._sqlite.execute(
+                "INSERT OR REPLACE INTO dedup (key, state, expires_at) VALUES (?, ?, ?)",
+                (key, DONE, expires_at)
+            )
+            # Limpieza incremental de claves vencidas
+            self._sqlite.execute(
+                "DELETE FROM dedup WHERE rowid IN (SELECT rowid FROM dedup WHERE expires_at <= ? LIMIT 100)",
+                (time.time(),)
+            )
+
+    def _release_sqlite(self, key: str) -> None:
+        with self._sqlite:
+            self._sqlite.execute("DELETE FROM dedup WHERE key = ? AND state = ?", (key, _PROCESSING))
+
+    async def release(self, key: str) -> None:
+        """Libera la reserva de un mensaje que falló"""
+        try:
+            if self._redis is not None:
+                await self._redis.delete(f"mkw:dedup:{key}")
+            elif self._sqlite is not None:
+                await self._run_sqlite(self._release_sqlite, key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"No se pudo liberar la reserva del mensaje: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de deduplicación"""
+        return {
+            "enabled": self.enabled,
+            "backend": "redis" if self._redis is not None else "sqlite" if self._sqlite is not None else None,
+            "claimed": self.claimed,
+            "duplicates": self.duplicates,
+            "in_progress": self.in_progress,
+            "errors": self.errors,
+            "local_entries": len(self._done),
+        }
+
+
+# Instancia global del almacén de deduplicación
+dedup_store = DedupStore()
@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import time
+from array import array
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from app.config.settings import settings
+from app.services.mikrowisp_client import mikrowisp_client
+from app.services.sync_engine import (
+    ESTADO_ANULADA, ESTADO_NO_PAGADA, ESTADO_PAGADA, parse_estado, sync_engine
+)
+
+logger = logging.getLogger(__name__)
+
+# Límites (días de vencida) de los tramos de antigüedad de cartera
+AGING_BUCKETS = ("al_dia", "1_30", "31_60", "61_90", "mas_90")
+_AGING_EDGES = np.array([1, 31, 61, 91])
+
+def parse_cents(value: Any) -> int:
+    """Convierte un importe de Mikrowisp ("1,234.50") o un Decimal del espejo a centavos"""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, Decimal):
+        return int((value * 100).to_integral_value())
+    try:
+        return int((Decimal(str(value).replace(",", "")) * 100).to_integral_value())
+    except InvalidOperation:
+        return 0
+
+
+def format_cents(cents: int) -> str:
+    """Centavos a texto con dos decimales, igual que los importes de Mikrowisp"""
+    sign = "-" if cents < 0 else ""
+    cents = abs(int(cents))
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
+
+
+def _date_or_nat(value: Any) -> str:
+    """Fecha ISO de los primeros 10 caracteres, o "NaT" si no es una fecha válida"""
+    text = str(value or "")[:10]
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        return "NaT"
+    return text
+
+
+class InvoiceColumns:
+    """Almacén columnar de facturas.
+
+    Los importes se guardan como centavos enteros (int64) parseados una
+    sola vez; las fechas como ``datetime64[D]`` y la forma de pago como
+    código entero con su tabla de etiquetas.
+    """
+
+    def __init__(self, ids: np.ndarray, idcliente: np.ndarray, estado: np.ndarray,
+                 total: np.ndarray, cobrado: np.ndarray, vencimiento: np.ndarray,
+                 formapago: np.ndarray, formapago_labels: List[str]):
+        self.ids = ids
+        self.idcliente = idcliente
+        self.estado = estado
+        self.total = total
+        self.cobrado = cobrado
+        self.vencimiento = vencimiento
+        self.formapago = formapago
+        self.formapago_labels = formapago_labels
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def fingerprint(self) -> str:
+        """Huella de todas las columnas que leen los agregados, para detectar si cambiaron entre cargas"""
+        digest = hashlib.sha1()
+        for column in (self.ids, self.idcliente, self.estado, self.total, self.cobrado,
+                       self.vencimiento, self.formapago):
+            digest.update(column.tobytes())
+        digest.update("\x00".join(self.formapago_labels).encode())
+        return digest.hexdigest()
+
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (
+            self.ids, self.idcliente, self.estado, self.total, self.cobrado, self.vencimiento, self.formapago
+        ))
+
+
+class InvoiceColumnsBuilder:
+    """Acumula facturas en arrays compactos y construye las columnas"""
+
+    def __init__(self):
+        self._ids = array("q")
+        self._idcliente = array("q")
+        self._estado = array("b")
+        self._total = array("q")
+        self._cobrado = array("q")
+        self._formapago = array("h")
+        self._vencimiento: List[str] = []
+        self._labels: Dict[str, int] = {}
+
+    def add(self, invoice: Dict[str, Any]) -> None:
+        try:
+            invoice_id = int(invoice.get("id"))
+        except (TypeError, ValueError):
+            return
+
+        label = str(invoice.get("formapago") or "")
+        code = self._labels.get(label)
+        if code is None:
+            code = self._labels[label] = len(self._labels)
+
+        self._ids.append(invoice_id)
+        self._idcliente.append(int(invoice.get("idcliente") or 0))
+        self._estado.append(parse_estado(invoice.get("estado")))
+        self._total.append(parse_cents(invoice.get("total")))
+        self._cobrado.append(parse_cents(invoice.get("cobrado")))
+        self._formapago.append(code)
+        self._vencimiento.append(_date_or_nat(invoice.get("vencimiento")))
+
+    def build(self) -> InvoiceColumns:
+        return InvoiceColumns(
+            ids=np.frombuffer(self._ids, dtype=np.int64),
+            idcliente=np.frombuffer(self._idcliente, dtype=np.int64),
+            estado=np.frombuffer(self._estado, dtype=np.int8),
+            total=np.frombuffer(self._total, dtype=np.int64),
+            cobrado=np.frombuffer(self._cobrado, dtype=np.int64),
+            vencimiento=np.array(self._vencimiento, dtype="datetime64[D]"),
+            formapago=np.frombuffer(self._formapago, dtype=np.int16),
+            formapago_labels=list(self._labels)
+        )
+
+
+def compute_receivables(columns: InvoiceColumns, as_of: date,
+                        idcliente: Optional[int] = None) -> Dict[str, Any]:
+    """Calcula antigüedad de cartera, tasa de cobro y totales por forma de pago"""
+    mask = np.ones(len(columns), dtype=bool) if idcliente is None else columns.idcliente == idcliente
+
+    estado = columns.estado[mask]
+    total = columns.total[mask]
+    cobrado = columns.cobrado[mask]
+    formapago = columns.formapago[mask]
+
+    unpaid = estado == ESTADO_NO_PAGADA
+    paid = estado == ESTADO_PAGADA
+    billable = estado != ESTADO_ANULADA
+
+    # Antigüedad: días de vencida de las facturas no pagadas; sin fecha cuenta como al día
+    balance = np.clip(total[unpaid] - cobrado[unpaid], 0, None)
+    days_overdue = (np.datetime64(as_of, "D") - columns.vencimiento[mask][unpaid]).astype("int64")
+    days_overdue = np.where(np.isnat(columns.vencimiento[mask][unpaid]), 0, days_overdue)
+    bucket = np.digitize(days_overdue, _AGING_EDGES)
+    aging_amount = np.bincount(bucket, weights=balance, minlength=len(AGING_BUCKETS))
+    aging_count = np.bincount(bucket, minlength=len(AGING_BUCKETS))
+
+    labels = columns.formapago_labels
+    by_method_amount = np.bincount(formapago[paid], weights=cobrado[paid], minlength=len(labels))
+    by_method_count = np.bincount(formapago[paid], minlength=len(labels))
+
+    billed = int(total[billable].sum())
+    collected = int(cobrado[billable].sum())
+
+    return {
+        "fecha_corte": as_of.isoformat(),
+        "facturas": int(mask.sum()),
+        "no_pagadas": int(unpaid.sum()),
+        "pagadas": int(paid.sum()),
+        "anuladas": int((estado == ESTADO_ANULADA).sum()),
+        "total_facturado": format_cents(billed),
+        "total_cobrado": format_cents(collected),
+        "saldo_pendiente": format_cents(int(balance.sum())),
+        "tasa_cobro": round(collected / billed, 4) if billed else 0.0,
+        "antiguedad": {
+            name: {"facturas": int(aging_count[i]), "saldo": format_cents(int(aging_amount[i]))}
+            for i, name in enumerate(AGING_BUCKETS)
+        },
+        "por_forma_pago": {
+            (labels[i] or "sin_forma_pago"): {
+                "facturas": int(by_method_count[i]),
+                "cobrado": format_cents(int(by_method_amount[i]))
+            }
+            for i in range(len(labels)) if by_method_count[i]
+        },
+    }
+
+
+class InvoiceAnalyticsService:
+    """Mantiene el almacén columnar de facturas y memoriza los resultados.
+
+    La primera consulta carga las facturas y arranca una tarea que las
+    recarga en segundo plano cada ``invoice_analytics_ttl`` segundos; las
+    consultas siguientes usan las columnas vigentes sin esperar la recarga.
+    Los resultados memorizados solo se descartan si la recarga trae datos
+    distintos.
+    """
+
+    def __init__(self):
+        self.columns: Optional[InvoiceColumns] = None
+        self.version: Optional[str] = None
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._memo: Dict[Tuple[str, date, Optional[int]], Dict[str, Any]] = {}
+
+    def start(self) -> None:
+        """Inicia la recarga periódica en segundo plano"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.invoice_analytics_ttl)
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error recargando analítica de facturas: {e}")
+
+    async def _source(self) -> AsyncIterator[Dict[str, Any]]:
+        if settings.invoice_analytics_source == "mirror":
+            # Columnas tipadas del espejo: los importes ya son Numeric, no se reparsean desde ``datos``
+            async for invoice in sync_engine.stream_invoice_columns():
+                yield invoice
+        else:
+            async for page in mikrowisp_client.iter_invoice_pages():
+                for invoice in page:
+                    yield invoice
+
+    async def reload(self) -> None:
+        """Carga todas las facturas en el almacén columnar"""
+        async with self._lock:
+            if self.columns is not None and time.monotonic() - self.loaded_at < settings.invoice_analytics_ttl:
+                return
+
+            start = time.monotonic()
+            builder = InvoiceColumnsBuilder()
+            async for invoice in self._source():
+                builder.add(invoice)
+            columns = builder.build()
+
+            fingerprint = columns.fingerprint()
+            if fingerprint != self.version:
+                self._memo.clear()
+                self.version = fingerprint
+            self.columns = columns
+            self.loaded_at = time.monotonic()
+            logger.info(
+                f"Analítica de facturas cargada: {len(columns)} facturas en "
+                f"{time.monotonic() - start:.2f}s ({columns.nbytes() / 1024 / 1024:.1f} MiB)"
+            )
+
+    async def receivables(self, as_of: Optional[date] = None,
+                          idcliente: Optional[int] = None) -> Dict[str, Any]:
+        """Resumen de cartera memorizado por versión de datos, fecha de corte y cliente"""
+        if self.columns is None:
+            await self.reload()
+        self.start()
+
+        as_of = as_of or date.today()
+        key = (self.version, as_of, idcliente)
+        result = self._memo.get(key)
+        if result is None:
+            result = compute_receivables(self.columns, as_of, idcliente)
+            if len(self._memo) >= 256:
+                self._memo.clear()
+            self._memo[key] = result
+        return result
+
+
+# Instancia global del servicio de analítica
+invoice_analytics = InvoiceAnalyticsService()
@@ -0,0 +1,107 @@
+import os
+from typing import Tuple
+
+from app.config.settings import settings
+
+# prometheus_client elige el almacenamiento (memoria o archivos mmap) al importarse
+if settings.prometheus_multiproc_dir:
+    os.makedirs(settings.prometheus_multiproc_dir, exist_ok=True)
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.prometheus_multiproc_dir)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+)
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Buckets para llamadas lentas (IA, webhooks)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Duración de las peticiones HTTP por ruta y status",
+    ["method", "route", "status"],
+)
+
+mikrowisp_request_duration = Histogram(
+    "mikrowisp_request_duration_seconds",
+    "Duración de las llamadas a Mikrowisp (incluye aciertos de cache)",
+    ["endpoint"],
+)
+mikrowisp_errors = Counter(
+    "mikrowisp_errors_total",
+    "Errores en llamadas a Mikrowisp por endpoint y status HTTP expuesto",
+    ["endpoint", "status"],
+)
+
+openai_request_duration = Histogram(
+    "openai_request_duration_seconds",
+    "Duración de las llamadas a OpenAI",
+    ["operation"],
+    buckets=SLOW_BUCKETS,
+)
+openai_errors = Counter("openai_errors_total", "Errores en llamadas a OpenAI", ["operation"])
+openai_tokens = Counter("openai_tokens_total", "Tokens consumidos en OpenAI", ["operation", "type"])
+
+n8n_webhook_duration = Histogram(
+    "n8n_webhook_duration_seconds",
+    "Duración de los webhooks a N8N",
+    ["workflow_type", "outcome"],
+    buckets=SLOW_BUCKETS,
+)
+
+cache_lookups = Counter(
+    "response_cache_lookups_total",
+    "Consultas al cache de respuestas por resultado (hit, redis_hit, stale, miss)",
+    ["result"],
+)
+# Hijos pre-resueltos: cada consulta al cache es un único incremento
+CACHE_HIT = cache_lookups.labels("hit")
+CACHE_REDIS_HIT = cache_lookups.labels("redis_hit")
+CACHE_STALE = cache_lookups.labels("stale")
+CACHE_MISS = cache_lookups.labels("miss")
+
+jwt_cache_lookups = Counter(
+    "jwt_cache_lookups_total",
+    "Consultas al cache de tokens JWT verificados por resultado (hit, miss)",
+    ["result"],
+)
+JWT_CACHE_HIT = jwt_cache_lookups.labels("hit")
+JWT_CACHE_MISS = jwt_cache_lookups.labels("miss")
+
+rate_limit_rejections = Counter(
+    "rate_limit_rejections_total",
+    "Peticiones rechazadas con 429 por grupo de rate limiting",
+    ["group"],
+)
+
+# Carriles de prioridad del worker
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0)
+
+worker_lane_wait = Histogram(
+    "worker_lane_wait_seconds",
+    "Espera en la cola del carril hasta que el worker empieza a procesar el mensaje",
+    ["lane"],
+    buckets=WAIT_BUCKETS,
+)
+worker_message_duration = Histogram(
+    "worker_message_duration_seconds",
+    "Duración del procesamiento de mensajes del worker por carril y resultado",
+    ["lane", "outcome"],
+    buckets=SLOW_BUCKETS,
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposición en formato Prometheus; en modo multiproceso agrega todos los workers"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Limpia los archivos de un worker terminado (hook ``child_exit`` de gunicorn)"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
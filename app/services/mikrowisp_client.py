@@ -1,12 +1,55 @@
 import httpx
 import asyncio
-from typing import Dict, List, Optional, Any
+import re
+import time
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Any, Union
 from fastapi import HTTPException
 from app.config.settings import settings
+from app.utils.mikrowisp_response import validate_mikrowisp_response
+from app.services.cache import response_cache
+from app.services.metrics import mikrowisp_errors, mikrowisp_request_duration
+from app.services.singleflight import SingleFlight
+from app.services.concurrency import AdaptiveLimiter
+from app.services.resilience import CircuitBreaker, LatencyTracker, backoff_delay
+from app.utils import json_codec
+from app.utils.server_timing import span
 import logging
 
 logger = logging.getLogger(__name__)
 
+# TTL por defecto (segundos) de los endpoints de lectura cacheables; se sobrescriben con CACHE_TTLS
+CACHE_TTLS = {
+    "GetClientsDetails": 60,
+    "GetInvoice": 60,
+    "GetInvoices": 30,
+    "ListTicket": 30,
+    "GetRouters": 120,
+    "GetMonitoreo": 15,
+}
+
+# Endpoints sin efectos secundarios: se pueden coalescer y reintentar
+IDEMPOTENT_ENDPOINTS = {
+    "GetClientsDetails",
+    "GetInvoice",
+    "GetInvoices",
+    "ListTicket",
+    "ListInstall",
+    "GetRouters",
+    "GetMonitoreo",
+}
+
+# Endpoints de monitoreo: lentos y voluminosos, con su propio bulkhead
+MONITORING_ENDPOINTS = {"GetRouters", "GetMonitoreo"}
+
+# Detección barata de respuestas exitosas sin decodificar el JSON
+_ESTADO_EXITO = re.compile(rb'"estado"\s*:\s*"exito"', re.IGNORECASE)
+
+
+class RawResponse(NamedTuple):
+    """Cuerpo crudo de Mikrowisp y si su ``estado`` es ``exito``"""
+    body: bytes
+    ok: bool
+
 
 class MikrowispClient:
     """Cliente asíncrono para interactuar con la API de Mikrowisp"""
@@ -15,45 +58,431 @@ class MikrowispClient:
         self.base_url = settings.mikrowisp_base_url
         self.token = settings.mikrowisp_token
         self.timeout = settings.mikrowisp_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2 = False
+        self._in_flight = 0
+        self._requests_total = 0
+        self._cache_epoch = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._inflight = SingleFlight()
+        self._bulkheads = {
+            group: AdaptiveLimiter(
+                group,
+                max_limit=settings.bulkhead_limits.get(group, 16),
+                latency_target=settings.bulkhead_latency_targets.get(group, 2.0)
+            )
+            for group in ("reads", "writes", "monitoring")
+        }
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._retries = 0
+        self._hedges_sent = 0
+        self._hedges_won = 0
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Construye el cliente HTTP con los límites del pool configurados"""
+        limits = httpx.Limits(
+            max_connections=settings.mikrowisp_max_connections,
+            max_keepalive_connections=settings.mikrowisp_max_keepalive,
+            keepalive_expiry=settings.mikrowisp_keepalive_expiry
+        )
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=limits,
+            http2=self._http2,
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def startup(self) -> None:
+        """Crea el cliente HTTP compartido con pool de conexiones keep-alive"""
+        if self._client is not None:
+            return
+
+        self._http2 = settings.mikrowisp_http2
+        if self._http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 solicitado pero el paquete 'h2' no está instalado, usando HTTP/1.1")
+                self._http2 = False
+
+        self._client = self._build_client()
+        logger.info(
+            f"Pool HTTP de Mikrowisp iniciado (max={settings.mikrowisp_max_connections}, "
+            f"keepalive={settings.mikrowisp_max_keepalive}, http2={self._http2})"
+        )
+
+    async def shutdown(self) -> None:
+        """Cierra el cliente HTTP compartido y sus conexiones"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Pool HTTP de Mikrowisp cerrado")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Retorna el cliente compartido, creándolo si el lifespan no se ejecutó (p.ej. en el worker)"""
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso del pool de conexiones"""
+        stats = {
+            "started": self._client is not None,
+            "http2": self._http2,
+            "max_connections": settings.mikrowisp_max_connections,
+            "max_keepalive": settings.mikrowisp_max_keepalive,
+            "in_flight": self._in_flight,
+            "requests_total": self._requests_total,
+        }
+
+        # httpx no expone el pool públicamente; se inspecciona el pool de httpcore si existe
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+
+        return stats
+
+    def bulkhead_stats(self) -> Dict[str, Any]:
+        """Estadísticas de los bulkheads por grupo de endpoints"""
+        return {group: limiter.stats() for group, limiter in self._bulkheads.items()}
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Estado de los circuit breakers, reintentos y peticiones de cobertura"""
+        return {
+            "breakers": {name: breaker.stats() for name, breaker in self._breakers.items()},
+            "retries": self._retries,
+            "hedges_sent": self._hedges_sent,
+            "hedges_won": self._hedges_won,
+        }
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """Estadísticas de coalescencia de peticiones idénticas"""
+        return self._inflight.stats()
 
     async def _make_request(
             self,
             endpoint: str,
             data: Dict[str, Any] = None,
+            method: str = "POST",
+            cache_tags: Optional[List[str]] = None,
+            raw: bool = False
+    ) -> Union[Dict[str, Any], RawResponse]:
+        """Realiza peticiones HTTP a la API de Mikrowisp
+
+        Si se indican ``cache_tags`` y el endpoint tiene TTL, la respuesta se
+        sirve desde el cache de respuestas. Con ``raw`` se retorna el cuerpo
+        sin decodificar junto con una verificación barata del ``estado``.
+        """
+        name = self._endpoint_name(endpoint)
+        start = time.perf_counter()
+        with span(f"mikrowisp.{name}"):
+            try:
+                body = await self._request_body(endpoint, data, method, cache_tags)
+                if raw:
+                    return RawResponse(body, bool(_ESTADO_EXITO.search(body)))
+                try:
+                    return json_codec.loads(body)
+                except json_codec.JSONDecodeError:
+                    logger.error(f"Respuesta no JSON en {endpoint}")
+                    raise HTTPException(status_code=502, detail="Respuesta inválida de Mikrowisp")
+            except HTTPException as e:
+                mikrowisp_errors.labels(name, str(e.status_code)).inc()
+                raise
+            finally:
+                mikrowisp_request_duration.labels(name).observe(time.perf_counter() - start)
+
+    async def _request_body(
+            self,
+            endpoint: str,
+            data: Optional[Dict[str, Any]],
+            method: str,
+            cache_tags: Optional[List[str]]
+    ) -> bytes:
+        """Obtiene el cuerpo crudo de la respuesta, pasando por el cache si aplica"""
+        ttl = self._cache_ttl(endpoint) if cache_tags is not None else 0
+        if not ttl:
+            return await self._fetch(endpoint, data, method)
+
+        key = response_cache.make_key(endpoint, data)
+        cached = await response_cache.get(key)
+        if cached is not None:
+            body, fresh = cached
+            if not fresh:
+                self._schedule_refresh(key, endpoint, data, method, ttl, cache_tags)
+            return body
+
+        return await self._fetch_and_store(key, endpoint, data, method, ttl, cache_tags)
+
+    async def _fetch_and_store(self, key: str, endpoint: str, data: Optional[Dict[str, Any]],
+                               method: str, ttl: int, cache_tags: List[str]) -> bytes:
+        """Consulta Mikrowisp y guarda la respuesta si fue exitosa"""
+        epoch = self._cache_epoch
+        body = await self._fetch(endpoint, data, method)
+
+        # Si hubo una escritura mientras la petición estaba en vuelo, la respuesta puede ser vieja
+        if epoch == self._cache_epoch and _ESTADO_EXITO.search(body):
+            tags = list(cache_tags) + self._response_tags(endpoint, body)
+            await response_cache.set(key, body, ttl, tags)
+        return body
+
+    def _schedule_refresh(self, key: str, endpoint: str, data: Optional[Dict[str, Any]],
+                          method: str, ttl: int, cache_tags: List[str]) -> None:
+        """Revalida en segundo plano una entrada stale (una sola vez por clave)"""
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch_and_store(key, endpoint, data, method, ttl, cache_tags)
+            except Exception as e:
+                logger.warning(f"No se pudo revalidar cache de {endpoint}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def _cache_ttl(self, endpoint: str) -> int:
+        """TTL configurado para un endpoint (0 si no se cachea)"""
+        if not settings.cache_enabled:
+            return 0
+        name = self._endpoint_name(endpoint)
+        return settings.cache_ttls.get(name, CACHE_TTLS.get(name, 0))
+
+    @staticmethod
+    def _response_tags(endpoint: str, body: bytes) -> List[str]:
+        """Etiquetas de cliente derivadas del contenido de la respuesta"""
+        try:
+            result = json_codec.loads(body)
+        except json_codec.JSONDecodeError:
+            return []
+
+        client_ids = set()
+        if endpoint.endswith("GetClientsDetails"):
+            for item in result.get("datos") or []:
+                if isinstance(item, dict) and item.get("id"):
+                    client_ids.add(item["id"])
+        else:
+            for value in result.values():
+                items = value if isinstance(value, list) else [value]
+                for item in items:
+                    if isinstance(item, dict) and item.get("idcliente"):
+                        client_ids.add(item["idcliente"])
+
+        return [f"cliente:{client_id}" for client_id in client_ids]
+
+    async def _invalidate(self, *tags: str) -> None:
+        """Invalida entradas del cache tras una escritura"""
+        self._cache_epoch += 1
+        await response_cache.invalidate(*tags)
+
+    async def _invalidate_invoice(self, invoice_id: Any) -> None:
+        """Invalida una factura, las listas de facturas y los clientes asociados"""
+        tag = f"factura:{invoice_id}"
+        related = await response_cache.related_tags(tag, "cliente:")
+        await self._invalidate(tag, "facturas", *related)
+
+    @staticmethod
+    def _endpoint_name(endpoint: str) -> str:
+        """Nombre corto del endpoint (p.ej. GetInvoices)"""
+        return endpoint.rstrip("/").rsplit("/", 1)[-1]
+
+    def _endpoint_group(self, endpoint: str) -> str:
+        """Grupo de bulkhead al que pertenece un endpoint"""
+        name = self._endpoint_name(endpoint)
+        if name in MONITORING_ENDPOINTS:
+            return "monitoring"
+        if name in IDEMPOTENT_ENDPOINTS:
+            return "reads"
+        return "writes"
+
+    async def _fetch(
+            self,
+            endpoint: str,
+            data: Optional[Dict[str, Any]] = None,
+            method: str = "POST"
+    ) -> bytes:
+        """Ejecuta la petición, compartiéndola entre llamadores idénticos si es idempotente"""
+        if settings.mikrowisp_coalesce and self._endpoint_name(endpoint) in IDEMPOTENT_ENDPOINTS:
+            key = f"{method.upper()}:{response_cache.make_key(endpoint, data)}"
+            return await self._inflight.do(key, lambda: self._send(endpoint, data, method))
+        return await self._send(endpoint, data, method)
+
+    def _breaker(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.breaker_failure_threshold,
+                reset_timeout=settings.breaker_reset_timeout
+            )
+            self._breakers[name] = breaker
+        return breaker
+
+    def _latency(self, name: str) -> LatencyTracker:
+        tracker = self._latencies.get(name)
+        if tracker is None:
+            tracker = LatencyTracker()
+            self._latencies[name] = tracker
+        return tracker
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Errores transitorios: red, timeouts, 5xx y 429"""
+        if isinstance(error, httpx.HTTPStatusError):
+            status_code = error.response.status_code
+            return status_code >= 500 or status_code == 429
+        return isinstance(error, httpx.TransportError)
+
+    @staticmethod
+    def _to_http_exception(endpoint: str, error: Exception) -> HTTPException:
+        """Traduce un error de httpx a la HTTPException expuesta por la API"""
+        if isinstance(error, httpx.TimeoutException):
+            logger.error(f"Timeout en solicitud a {endpoint}")
+            return HTTPException(status_code=408, detail="Timeout en solicitud a Mikrowisp")
+        if isinstance(error, httpx.HTTPStatusError):
+            logger.error(f"Error HTTP {error.response.status_code} en {endpoint}: {error.response.text}")
+            return HTTPException(
+                status_code=error.response.status_code,
+                detail=f"Error en Mikrowisp: {error.response.text}"
+            )
+        logger.error(f"Error de conexión en {endpoint}: {str(error)}")
+        return HTTPException(status_code=502, detail="Error de conexión con Mikrowisp")
+
+    async def _send(
+            self,
+            endpoint: str,
+            data: Optional[Dict[str, Any]] = None,
             method: str = "POST"
-    ) -> Dict[str, Any]:
-        """Realiza peticiones HTTP a la API de Mikrowisp"""
+    ) -> bytes:
+        """Ejecuta la petición HTTP con circuit breaker, reintentos y hedging"""
+        name = self._endpoint_name(endpoint)
+        breaker = self._breaker(name)
+        if not breaker.allow():
+            logger.warning(f"Circuito abierto para {endpoint}, rechazando petición")
+            raise HTTPException(status_code=503, detail="Mikrowisp no disponible temporalmente")
 
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        url = f"/{endpoint.lstrip('/')}"
         request_data = {"token": self.token}
 
         if data:
             request_data.update(data)
 
-        headers = {"Content-Type": "application/json"}
+        idempotent = name in IDEMPOTENT_ENDPOINTS
+        max_retries = settings.mikrowisp_retries if idempotent else 0
+        attempt = 0
+        recorded = False
+
+        try:
+            while True:
+                try:
+                    if idempotent and settings.mikrowisp_hedging:
+                        body = await self._hedged_attempt(name, url, request_data, method)
+                    else:
+                        body = await self._attempt(name, url, request_data, method)
+                    breaker.record_success()
+                    recorded = True
+                    return body
+
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    retryable = self._is_retryable(e)
+                    if retryable and attempt < max_retries:
+                        delay = backoff_delay(
+                            attempt, settings.mikrowisp_retry_backoff_base, settings.mikrowisp_retry_backoff_max
+                        )
+                        attempt += 1
+                        self._retries += 1
+                        logger.warning(f"Reintentando {endpoint} ({attempt}/{max_retries}) en {delay:.2f}s: {e!r}")
+                        await asyncio.sleep(delay)
+                        continue
+
+                    # Un 4xx indica que Mikrowisp responde: no cuenta como fallo del circuito
+                    if retryable:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    recorded = True
+                    raise self._to_http_exception(endpoint, e)
+
+                except HTTPException:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error inesperado en {endpoint}: {str(e)}")
+                    raise HTTPException(status_code=500, detail="Error interno del servidor")
+        finally:
+            if not recorded:
+                breaker.cancel_probe()
+
+    async def _hedged_attempt(self, name: str, url: str, request_data: Dict[str, Any], method: str) -> bytes:
+        """Lanza una segunda petición si la primera supera el p95 observado del endpoint"""
+        tracker = self._latency(name)
+        if len(tracker) < settings.mikrowisp_hedge_min_samples:
+            return await self._attempt(name, url, request_data, method)
+
+        primary = asyncio.ensure_future(self._attempt(name, url, request_data, method))
+        done, _ = await asyncio.wait({primary}, timeout=tracker.p95())
+        if done:
+            return primary.result()
 
+        self._hedges_sent += 1
+        hedge = asyncio.ensure_future(self._attempt(name, url, request_data, method))
+        pending = {primary, hedge}
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                if method.upper() == "POST":
-                    response = await client.post(url, json=request_data, headers=headers)
-                else:
-                    response = await client.get(url, params=request_data, headers=headers)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedges_won += 1
+                        return task.result()
+            # Ambas fallaron: se propaga el error de la petición original
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
 
-                response.raise_for_status()
-                return response.json()
+    async def _attempt(self, name: str, url: str, request_data: Dict[str, Any], method: str) -> bytes:
+        """Un único intento HTTP dentro del bulkhead del endpoint"""
+        client = self._get_client()
+        limiter = self._bulkheads[self._endpoint_group(name)] if settings.bulkhead_enabled else None
+        if limiter is not None:
+            try:
+                await limiter.acquire(settings.bulkhead_queue_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Bulkhead '{limiter.name}' saturado, rechazando {name}")
+                raise HTTPException(status_code=503, detail="Mikrowisp saturado, intente más tarde")
+
+        self._in_flight += 1
+        self._requests_total += 1
+        start = time.monotonic()
+        latency = None
+        success = False
+
+        try:
+            if method.upper() == "POST":
+                response = await client.post(
+                    url, content=json_codec.dumps(request_data), headers={"Content-Type": "application/json"}
+                )
+            else:
+                response = await client.get(url, params=request_data)
+
+            latency = time.monotonic() - start
+            success = response.status_code < 500
+            response.raise_for_status()
+            self._latency(name).record(latency)
+            return response.content
 
         except httpx.TimeoutException:
-            logger.error(f"Timeout en solicitud a {endpoint}")
-            raise HTTPException(status_code=408, detail="Timeout en solicitud a Mikrowisp")
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Error HTTP {e.response.status_code} en {endpoint}: {e.response.text}")
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Error en Mikrowisp: {e.response.text}"
-            )
-        except Exception as e:
-            logger.error(f"Error inesperado en {endpoint}: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error interno del servidor")
+            latency = time.monotonic() - start
+            raise
+        finally:
+            self._in_flight -= 1
+            if limiter is not None:
+                limiter.release(latency, success)
 
     # Métodos para Clientes
     async def create_client(self, client_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -61,69 +490,167 @@ class MikrowispClient:
         return await self._make_request("/api/v1/NewUser", client_data)
 
     async def get_client_details(self, client_id: Optional[int] = None,
-                                 cedula: Optional[str] = None) -> Dict[str, Any]:
+                                 cedula: Optional[str] = None,
+                                 telefono: Optional[str] = None,
+                                 cache: bool = True,
+                                 raw: bool = False) -> Union[Dict[str, Any], RawResponse]:
         """Obtiene detalles de un cliente"""
         data = {}
+        tags = []
         if client_id:
             data["idcliente"] = client_id
+            tags.append(f"cliente:{client_id}")
         if cedula:
             data["cedula"] = cedula
-        return await self._make_request("/api/v1/GetClientsDetails", data)
+        if telefono:
+            data["telefono"] = telefono
+        return await self._make_request(
+            "/api/v1/GetClientsDetails", data, cache_tags=tags if cache else None, raw=raw
+        )
 
     async def update_client(self, client_id: int, client_data: Dict[str, Any]) -> Dict[str, Any]:
         """Actualiza datos de un cliente"""
         data = {"idcliente": client_id, "datos": client_data}
-        return await self._make_request("/api/v1/UpdateUser", data)
+        try:
+            return await self._make_request("/api/v1/UpdateUser", data)
+        finally:
+            await self._invalidate(f"cliente:{client_id}")
 
     async def activate_client(self, client_id: int) -> Dict[str, Any]:
         """Activa un cliente"""
         data = {"idcliente": client_id}
-        return await self._make_request("/api/v1/ActiveService", data)
+        try:
+            return await self._make_request("/api/v1/ActiveService", data)
+        finally:
+            await self._invalidate(f"cliente:{client_id}")
 
     async def suspend_client(self, client_id: int) -> Dict[str, Any]:
         """Suspende un cliente"""
         data = {"idcliente": client_id}
-        return await self._make_request("/api/v1/SuspendService", data)
+        try:
+            return await self._make_request("/api/v1/SuspendService", data)
+        finally:
+            await self._invalidate(f"cliente:{client_id}")
 
     # Métodos para Facturas
     async def create_invoice(self, client_id: int, due_date: str) -> Dict[str, Any]:
         """Crea una nueva factura"""
         data = {"idcliente": client_id, "vencimiento": due_date}
-        return await self._make_request("/api/v1/CreateInvoice", data)
+        try:
+            return await self._make_request("/api/v1/CreateInvoice", data)
+        finally:
+            await self._invalidate(f"cliente:{client_id}", "facturas")
 
-    async def get_invoices(self, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def get_invoices(self, filters: Dict[str, Any] = None,
+                           raw: bool = False) -> Union[Dict[str, Any], RawResponse]:
         """Obtiene lista de facturas con filtros opcionales"""
         data = filters or {}
-        return await self._make_request("/api/v1/GetInvoices", data)
+        tags = ["facturas"]
+        if data.get("idcliente"):
+            tags.append(f"cliente:{data['idcliente']}")
+        return await self._make_request("/api/v1/GetInvoices", data, cache_tags=tags, raw=raw)
+
+    async def iter_invoice_pages(
+            self,
+            filters: Dict[str, Any] = None,
+            page_size: Optional[int] = None,
+            start_offset: int = 0
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Recorre todas las facturas página a página (sin pasar por el cache)
+
+        Pagina con ``limit``/``offset``. Cualquier página con error lanza
+        ``HTTPException`` (vía ``validate_mikrowisp_response``), y si
+        Mikrowisp ignora ``offset`` y repite la misma página se lanza un 502
+        en lugar de ciclar: el recorrido nunca termina a medias en silencio.
+        """
+        page_size = page_size or settings.invoice_page_size
+        offset = start_offset
+        previous_first = None
+
+        while True:
+            data = dict(filters or {}, limit=page_size, offset=offset)
+            response = await self._make_request("/api/v1/GetInvoices", data)
+            validate_mikrowisp_response(response)
+
+            invoices = response.get("facturas") or []
+            if not invoices:
+                return
+
+            first = invoices[0].get("id")
+            if previous_first is not None and first == previous_first:
+                logger.error(f"GetInvoices ignoró offset={offset}; la paginación no puede continuar")
+                raise HTTPException(
+                    status_code=502,
+                    detail="Mikrowisp no soporta paginación de facturas (offset ignorado)"
+                )
+            previous_first = first
 
-    async def get_invoice(self, invoice_id: int) -> Dict[str, Any]:
+            yield invoices
+
+            if len(invoices) < page_size:
+                return
+            offset += page_size
+
+    async def get_invoice(self, invoice_id: int, cache: bool = True) -> Dict[str, Any]:
         """Obtiene detalles de una factura específica"""
         data = {"idfactura": invoice_id}
-        return await self._make_request("/api/v1/GetInvoice", data)
+        return await self._make_request(
+            "/api/v1/GetInvoice", data, cache_tags=[f"factura:{invoice_id}"] if cache else None
+        )
 
     async def pay_invoice(self, payment_data: Dict[str, Any]) -> Dict[str, Any]:
         """Registra pago de una factura"""
-        return await self._make_request("/api/v1/PaidInvoice", payment_data)
+        try:
+            return await self._make_request("/api/v1/PaidInvoice", payment_data)
+        finally:
+            await self._invalidate_invoice(payment_data.get("idfactura"))
+
+    async def create_promise_payment(self, promise_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Crea una promesa de pago"""
+        try:
+            return await self._make_request("/api/v1/PromesaPago", promise_data)
+        finally:
+            await self._invalidate_invoice(promise_data.get("idfactura"))
+
+    async def delete_payment(self, invoice_id: int) -> Dict[str, Any]:
+        """Elimina el pago de una factura"""
+        data = {"factura": invoice_id}
+        try:
+            return await self._make_request("/api/v1/DeleteTransaccion", data)
+        finally:
+            await self._invalidate_invoice(invoice_id)
 
     async def delete_invoice(self, invoice_id: int) -> Dict[str, Any]:
         """Elimina una factura"""
         data = {"idfactura": invoice_id}
-        return await self._make_request("/DeleteInvoice", data)
+        try:
+            return await self._make_request("/DeleteInvoice", data)
+        finally:
+            await self._invalidate_invoice(invoice_id)
 
     # Métodos para Tickets
     async def create_ticket(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
         """Crea un nuevo ticket de soporte"""
-        return await self._make_request("/api/v1/NewTicket", ticket_data)
+        try:
+            return await self._make_request("/api/v1/NewTicket", ticket_data)
+        finally:
+            await self._invalidate(f"cliente:{ticket_data.get('idcliente')}")
 
     async def close_ticket(self, ticket_id: int, reason: str = "") -> Dict[str, Any]:
         """Cierra un ticket"""
         data = {"idticket": ticket_id, "motivo_cierre": reason}
-        return await self._make_request("/api/v1/CloseTicket", data)
+        try:
+            return await self._make_request("/api/v1/CloseTicket", data)
+        finally:
+            # El ticket no indica su cliente: se invalidan todas las listas de tickets
+            await self._invalidate("tickets")
 
     async def list_tickets(self, client_id: int) -> Dict[str, Any]:
         """Lista tickets de un cliente"""
         data = {"idcliente": client_id}
-        return await self._make_request("/api/v1/ListTicket", data)
+        return await self._make_request(
+            "/api/v1/ListTicket", data, cache_tags=[f"cliente:{client_id}", "tickets"]
+        )
 
     # Métodos para Mensajería
     async def send_sms(self, client_id: int, message: str) -> Dict[str, Any]:
@@ -142,15 +669,15 @@ class MikrowispClient:
         return await self._make_request("/api/v1/ListInstall", data)
 
     # Métodos para Routers y Monitoreo
-    async def get_routers(self, router_id: int = -1) -> Dict[str, Any]:
+    async def get_routers(self, router_id: int = -1, raw: bool = False) -> Union[Dict[str, Any], RawResponse]:
         """Obtiene lista de routers"""
         data = {"id": router_id}
-        return await self._make_request("/api/v1/GetRouters", data)
+        return await self._make_request("/api/v1/GetRouters", data, cache_tags=["routers"], raw=raw)
 
-    async def get_monitoring(self, equipment_id: int = -1) -> Dict[str, Any]:
+    async def get_monitoring(self, equipment_id: int = -1, raw: bool = False) -> Union[Dict[str, Any], RawResponse]:
         """Obtiene equipos en monitoreo"""
         data = {"id": equipment_id}
-        return await self._make_request("/api/v1/GetMonitoreo", data)
+        return await self._make_request("/api/v1/GetMonitoreo", data, cache_tags=["monitoreo"], raw=raw)
 
 
 # Instancia global del cliente
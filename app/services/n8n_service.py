@@ -1,9 +1,13 @@
 import httpx
 import asyncio
+import time
 from typing import Dict, Any
 import logging
 
 from app.config.settings import settings
+from app.services.metrics import n8n_webhook_duration
+from app.utils import json_codec
+from app.utils.server_timing import span
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +26,8 @@ class N8NService:
             workflow_type: str = "mikrowisp_integration"
     ) -> Dict[str, Any]:
         """Dispara un workflow en N8N"""
+        start = time.perf_counter()
+        outcome = "error"
         try:
             headers = {
                 "Content-Type": "application/json",
@@ -34,14 +40,17 @@ class N8NService:
                 "timestamp": asyncio.get_event_loop().time()
             }
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.webhook_url,
-                    json=payload,
-                    headers=headers
-                )
-                response.raise_for_status()
-                return response.json()
+            with span(f"n8n.{workflow_type}"):
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.post(
+                        self.webhook_url,
+                        content=json_codec.dumps(payload),
+                        headers=headers
+                    )
+                    response.raise_for_status()
+                    result = json_codec.loads(response.content)
+            outcome = "ok"
+            return result
 
         except httpx.TimeoutException:
             logger.error(f"Timeout en webhook N8N para {workflow_type}")
@@ -52,6 +61,8 @@ class N8NService:
         except Exception as e:
             logger.error(f"Error inesperado en N8N: {str(e)}")
             raise
+        finally:
+            n8n_webhook_duration.labels(workflow_type, outcome).observe(time.perf_counter() - start)
 
     async def notify_client_created(self, client_data: Dict[str, Any]) -> None:
         """Notifica creación de cliente a N8N"""
@@ -3,8 +3,11 @@ from openai import AsyncOpenAI
 from typing import Dict, List, Any, Optional
 import json
 import logging
+import time
 
 from app.config.settings import settings
+from app.services.metrics import openai_errors, openai_request_duration, openai_tokens
+from app.utils.server_timing import span
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +19,23 @@ class OpenAIService:
         self.client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.model = settings.openai_model
 
+    async def _create_completion(self, operation: str, **kwargs):
+        """Llama a chat.completions registrando latencia, errores y tokens por operación"""
+        start = time.perf_counter()
+        try:
+            with span(f"openai.{operation}"):
+                response = await self.client.chat.completions.create(model=self.model, **kwargs)
+        except Exception:
+            openai_errors.labels(operation).inc()
+            raise
+        finally:
+            openai_request_duration.labels(operation).observe(time.perf_counter() - start)
+
+        if response.usage is not None:
+            openai_tokens.labels(operation, "prompt").inc(response.usage.prompt_tokens)
+            openai_tokens.labels(operation, "completion").inc(response.usage.completion_tokens)
+        return response
+
     async def process_client_query(
             self,
             query: str,
@@ -25,8 +45,8 @@ class OpenAIService:
         try:
             system_prompt = self._build_system_prompt(client_context)
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            response = await self._create_completion(
+                "client_query",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": query}
@@ -76,8 +96,8 @@ class OpenAIService:
             - general: Mensaje general
             """
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            response = await self._create_completion(
+                "sms_content",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.5,
                 max_tokens=100
@@ -0,0 +1,184 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Tuple
+import logging
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Token bucket atómico en Redis: recarga según el tiempo del servidor y consume ``cost``.
+# Retorna {permitido, tokens restantes}; los tokens van como texto para conservar decimales.
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = burst
+    ts = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RateLimitRule(NamedTuple):
+    """Límite de un grupo de rutas: ``rate`` tokens/s con ráfaga de ``burst``"""
+    group: str
+    rate: float
+    burst: float
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int
+    reset: int
+
+
+def _decision(rule: RateLimitRule, allowed: bool, tokens: float, cost: float) -> RateLimitDecision:
+    """Calcula los valores de los headers a partir de los tokens que quedan en el bucket"""
+    retry_after = 0 if allowed else math.ceil((cost - tokens) / rule.rate)
+    reset = math.ceil((rule.burst - tokens) / rule.rate)
+    return RateLimitDecision(allowed, int(rule.burst), int(tokens), retry_after, reset)
+
+
+class MemoryTokenBuckets:
+    """Token buckets en proceso, con LRU acotado a ``max_keys`` buckets"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def hit(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> RateLimitDecision:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [rule.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(rule.burst, bucket[0] + (now - bucket[1]) * rule.rate)
+            bucket[1] = now
+
+        allowed = bucket[0] >= cost
+        if allowed:
+            bucket[0] -= cost
+        return _decision(rule, allowed, bucket[0], cost)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Rate limiting por token bucket, clave = sujeto del JWT (o IP) + grupo de rutas.
+
+    El grupo es el prefijo de ruta más largo de ``rate_limit_rules``. Con
+    ``rate_limit_backend=redis`` los buckets viven en Redis y se actualizan
+    con un script Lua atómico, así el límite se comparte entre workers; si
+    Redis falla se usa el backend en proceso.
+    """
+
+    def __init__(self):
+        self.memory = MemoryTokenBuckets(settings.rate_limit_max_keys)
+        self.default_rule = self._rule("default", settings.rate_limit_rules.get("default", {}))
+        self.rules: List[Tuple[str, RateLimitRule]] = sorted(
+            ((prefix, self._rule(prefix, values)) for prefix, values in settings.rate_limit_rules.items()
+             if prefix != "default"),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self._redis = None
+        self._script = None
+        self.allowed = 0
+        self.limited = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def _rule(group: str, values: Dict[str, float]) -> RateLimitRule:
+        """Valida una regla de ``rate_limit_rules``: rate y burst deben ser positivos"""
+        rule = RateLimitRule(group, float(values.get("rate", 10)), float(values.get("burst", 40)))
+        if rule.rate <= 0 or rule.burst <= 0:
+            raise ValueError(
+                f"RATE_LIMIT_RULES[{group!r}]: rate y burst deben ser mayores que 0 "
+                f"(rate={rule.rate}, burst={rule.burst}); para no limitar una ruta use RATE_LIMIT_EXEMPT"
+            )
+        return rule
+
+    async def startup(self) -> None:
+        """Conecta Redis si el backend configurado es redis"""
+        if settings.rate_limit_backend != "redis" or self._redis is not None:
+            return
+        try:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(settings.redis_url)
+            await self._redis.ping()
+            self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+            logger.info("Rate limiting con backend Redis")
+        except Exception as e:
+            logger.warning(f"Redis no disponible para rate limiting, usando backend en proceso: {e}")
+            self._redis = None
+
+    async def shutdown(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def is_exempt(self, path: str) -> bool:
+        return any(path.startswith(prefix) for prefix in settings.rate_limit_exempt)
+
+    def rule_for(self, path: str) -> RateLimitRule:
+        for prefix, rule in self.rules:
+            if path.startswith(prefix):
+                return rule
+        return self.default_rule
+
+    async def hit(self, identity: str, rule: RateLimitRule, cost: float = 1.0) -> RateLimitDecision:
+        key = f"{identity}|{rule.group}"
+        if self._redis is not None:
+            try:
+                allowed, tokens = await self._script(
+                    keys=[f"mkw:ratelimit:{key}"], args=[rule.rate, rule.burst, cost]
+                )
+                decision = _decision(rule, bool(allowed), float(tokens), cost)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Error de Redis en rate limiting, usando backend en proceso: {e}")
+                decision = await self.memory.hit(key, rule, cost)
+        else:
+            decision = await self.memory.hit(key, rule, cost)
+
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del rate limiting"""
+        return {
+            "backend": "redis" if self._redis is not None else "memory",
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "local_buckets": len(self.memory),
+            "redis_errors": self.redis_errors,
+        }
+
+
+# Instancia global del rate limiter
+rate_limiter = RateLimiter()
@@ -0,0 +1,106 @@
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Backoff exponencial con jitter completo: U(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Circuit breaker por endpoint.
+
+    Se abre tras ``failure_threshold`` fallos consecutivos y rechaza
+    llamadas durante ``reset_timeout`` segundos. Pasado ese tiempo deja
+    pasar una única llamada de prueba (half-open): si tiene éxito se
+    cierra, si falla vuelve a abrirse.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Indica si se permite una llamada en el estado actual"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = self.CLOSED
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def cancel_probe(self) -> None:
+        """Libera la llamada de prueba si terminó sin resultado (p.ej. cancelada)"""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del breaker"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias para estimar percentiles"""
+
+    def __init__(self, window: int = 200, recompute_every: int = 20):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._recompute_every = recompute_every
+        self._since_recompute = 0
+        self._p95: Optional[float] = None
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+        self._since_recompute += 1
+        if self._since_recompute >= self._recompute_every:
+            self._since_recompute = 0
+            self._p95 = None
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def p95(self) -> Optional[float]:
+        """Percentil 95 de la ventana (se recalcula cada ``recompute_every`` muestras)"""
+        if not self._samples:
+            return None
+        if self._p95 is None:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return self._p95
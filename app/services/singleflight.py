@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    """Petición en vuelo compartida por varios llamadores"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 1
+
+
+class SingleFlight:
+    """Coalesce llamadas concurrentes idénticas en una sola ejecución.
+
+    El primer llamador lanza la petición como tarea independiente; los que
+    llegan con la misma clave mientras sigue en vuelo esperan el mismo
+    resultado. La cancelación de un llamador no cancela la petición
+    compartida.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.saved = 0
+        self.max_waiters = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta ``fn`` o se une a la ejecución en curso con la misma clave"""
+        call = self._calls.get(key)
+        if call is not None:
+            call.waiters += 1
+            self.saved += 1
+            if call.waiters > self.max_waiters:
+                self.max_waiters = call.waiters
+        else:
+            task = asyncio.ensure_future(fn())
+            call = _Call(task)
+            self._calls[key] = call
+            self.executed += 1
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            # Al terminar o cancelarse, el llamador deja de esperar
+            call.waiters -= 1
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is not None and self._calls[key].task is task:
+            del self._calls[key]
+        # Evita avisos de "exception was never retrieved" si todos los llamadores se cancelaron
+        if not task.cancelled():
+            task.exception()
+
+    def waiters(self) -> Dict[str, int]:
+        """Número de llamadores que siguen esperando por cada clave en vuelo"""
+        return {key: call.waiters for key, call in self._calls.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de coalescencia"""
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "saved": self.saved,
+            "max_waiters": self.max_waiters,
+        }
@@ -0,0 +1,378 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config.settings import settings
+from app.models.mirror import MirrorClient, MirrorInvoice, SyncCheckpoint
+from app.services.concurrency import iter_bounded
+from app.services.database import create_tables, get_session_factory
+from app.services.mikrowisp_client import mikrowisp_client
+
+logger = logging.getLogger(__name__)
+
+ESTADO_PAGADA = 0
+ESTADO_NO_PAGADA = 1
+ESTADO_ANULADA = 2
+ESTADO_DESCONOCIDO = -1
+
+
+def parse_estado(value: Any) -> int:
+    """Normaliza el estado de la factura (texto o código) a 0/1/2"""
+    text = str(value or "").strip().lower()
+    if text in ("0", "1", "2"):
+        return int(text)
+    if "anulad" in text:
+        return ESTADO_ANULADA
+    if "no pagad" in text or "pendiente" in text or "vencid" in text:
+        return ESTADO_NO_PAGADA
+    if "pagad" in text:
+        return ESTADO_PAGADA
+    return ESTADO_DESCONOCIDO
+
+
+def _decimal(value: Any) -> Optional[Decimal]:
+    """Convierte importes de Mikrowisp ("1,234.50") a Decimal"""
+    if value is None or value == "":
+        return None
+    try:
+        return Decimal(str(value).replace(",", ""))
+    except InvalidOperation:
+        return None
+
+
+def _client_row(item: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    return {
+        "id": int(item["id"]),
+        "nombre": item.get("nombre"),
+        "cedula": item.get("cedula"),
+        "telefono": item.get("telefono"),
+        "movil": item.get("movil"),
+        "correo": item.get("correo"),
+        "estado": item.get("estado"),
+        "datos": item,
+        "synced_at": now,
+    }
+
+
+def _invoice_row(item: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    return {
+        "id": int(item["id"]),
+        "idcliente": int(item["idcliente"]) if item.get("idcliente") else None,
+        "estado": str(item.get("estado", "")) or None,
+        "emitido": item.get("emitido"),
+        "vencimiento": item.get("vencimiento"),
+        "fechapago": item.get("fechapago"),
+        "formapago": item.get("formapago"),
+        "total": _decimal(item.get("total")),
+        "cobrado": _decimal(item.get("cobrado")),
+        "datos": item,
+        "synced_at": now,
+    }
+
+
+class SyncEngine:
+    """Sincroniza clientes y facturas de Mikrowisp en un espejo PostgreSQL.
+
+    La primera ejecución hace una carga completa; las siguientes son
+    incrementales a partir del checkpoint guardado. El checkpoint se
+    actualiza tras cada lote, de modo que una sincronización interrumpida
+    se reanuda donde quedó.
+    """
+
+    def __init__(self):
+        self._tables_ready = False
+        self._locks = {"clients": asyncio.Lock(), "invoices": asyncio.Lock()}
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+
+    async def _ensure_tables(self) -> None:
+        if not self._tables_ready:
+            await create_tables()
+            self._tables_ready = True
+
+    async def _load_checkpoint(self, name: str) -> SyncCheckpoint:
+        async with get_session_factory()() as session:
+            checkpoint = await session.get(SyncCheckpoint, name)
+            if checkpoint is None:
+                checkpoint = SyncCheckpoint(name=name, cursor=0, status="idle", rows=0,
+                                            updated_at=datetime.utcnow())
+            return checkpoint
+
+    async def _save_checkpoint(self, name: str, cursor: int, status: str, rows: int) -> None:
+        now = datetime.utcnow()
+        values = {"name": name, "cursor": cursor, "status": status, "rows": rows, "updated_at": now}
+        if status == "done":
+            values["completed_at"] = now
+        stmt = insert(SyncCheckpoint).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncCheckpoint.name],
+            set_={key: stmt.excluded[key] for key in values if key != "name"}
+        )
+        async with get_session_factory()() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def _upsert(self, model, rows: List[Dict[str, Any]]) -> None:
+        """Inserta o actualiza filas en lotes de ``sync_batch_size``"""
+        batch_size = settings.sync_batch_size
+        # Postgres no admite dos filas con el mismo ID en un mismo INSERT ... ON CONFLICT
+        rows = list({row["id"]: row for row in rows}.values())
+        if not rows:
+            return
+        async with get_session_factory()() as session:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                stmt = insert(model).values(batch)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[model.id],
+                    set_={key: stmt.excluded[key] for key in batch[0] if key != "id"}
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+    async def _fetch_clients(self, client_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Obtiene clientes por ID; los inexistentes se omiten"""
+
+        async def fetch(client_id: int):
+            return await mikrowisp_client.get_client_details(client_id=client_id, cache=False)
+
+        found = {}
+        async for client_id, response, error in iter_bounded(client_ids, fetch, settings.sync_concurrency):
+            if error is not None:
+                if isinstance(error, HTTPException) and error.status_code == 404:
+                    continue
+                raise error
+            if str(response.get("estado", "")).lower() != "exito":
+                continue
+            for item in response.get("datos") or []:
+                if isinstance(item, dict) and item.get("id"):
+                    found[int(item["id"])] = item
+        return found
+
+    async def _fetch_invoices(self, invoice_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Obtiene facturas por ID con GetInvoice; las inexistentes se omiten"""
+
+        async def fetch(invoice_id: int):
+            return await mikrowisp_client.get_invoice(invoice_id, cache=False)
+
+        found = {}
+        async for invoice_id, response, error in iter_bounded(invoice_ids, fetch, settings.sync_concurrency):
+            if error is not None:
+                if isinstance(error, HTTPException) and error.status_code == 404:
+                    continue
+                raise error
+            if str(response.get("estado", "")).lower() != "exito":
+                continue
+            invoice = response.get("factura")
+            items = [invoice] if isinstance(invoice, dict) else response.get("facturas") or []
+            for item in items:
+                if isinstance(item, dict) and item.get("id"):
+                    found[int(item["id"])] = item
+        return found
+
+    async def _refresh_stale_clients(self) -> int:
+        """Vuelve a traer los ``sync_client_refresh_batch`` clientes sincronizados hace más tiempo.
+
+        Cada ejecución incremental avanza sobre los más antiguos, así todo el
+        espejo se refresca en ciclos sin recorrer todos los IDs cada vez.
+        """
+        if settings.sync_client_refresh_batch <= 0:
+            return 0
+        async with get_session_factory()() as session:
+            result = await session.execute(
+                select(MirrorClient.id).order_by(MirrorClient.synced_at).limit(settings.sync_client_refresh_batch)
+            )
+            client_ids = [row[0] for row in result]
+        found = await self._fetch_clients(client_ids)
+        now = datetime.utcnow()
+        await self._upsert(MirrorClient, [_client_row(item, now) for item in found.values()])
+        return len(found)
+
+    async def _refresh_unpaid_invoices(self) -> int:
+        """Refresca las facturas no pagadas, incluidas las que se pagaron desde la última sincronización.
+
+        GetInvoices con ``estado=1`` solo trae las que siguen sin pagar; las
+        que el espejo aún tiene como no pagadas y ya no aparecen ahí
+        cambiaron de estado y se vuelven a pedir una por una.
+        """
+        refresh_started = datetime.utcnow()
+        _, refreshed = await self._sync_invoice_pages({"estado": 1})
+
+        async with get_session_factory()() as session:
+            estados = (await session.execute(select(MirrorInvoice.estado).distinct())).scalars().all()
+            unpaid_values = [value for value in estados if parse_estado(value) == ESTADO_NO_PAGADA]
+            stale_ids = []
+            if unpaid_values:
+                # Las que el refresco anterior no tocó siguen marcadas con un synced_at viejo
+                result = await session.execute(
+                    select(MirrorInvoice.id).where(
+                        MirrorInvoice.estado.in_(unpaid_values),
+                        MirrorInvoice.synced_at < refresh_started
+                    )
+                )
+                stale_ids = [row[0] for row in result]
+
+        found = await self._fetch_invoices(stale_ids)
+        now = datetime.utcnow()
+        await self._upsert(MirrorInvoice, [_invoice_row(item, now) for item in found.values()])
+        logger.info(f"Refrescadas {refreshed} facturas no pagadas y {len(found)} que cambiaron de estado")
+        return refreshed + len(found)
+
+    async def sync_clients(self, full: bool = False, client_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Sincroniza clientes.
+
+        Mikrowisp no ofrece un listado de clientes, así que se recorren los
+        IDs en bloques desde el checkpoint hasta encontrar
+        ``sync_client_max_gap`` IDs seguidos sin cliente. La incremental
+        además refresca los clientes ya copiados más antiguos. Con
+        ``client_ids`` solo se refrescan esos clientes.
+        """
+        async with self._locks["clients"]:
+            await self._ensure_tables()
+
+            if client_ids:
+                found = await self._fetch_clients(client_ids)
+                now = datetime.utcnow()
+                await self._upsert(MirrorClient, [_client_row(item, now) for item in found.values()])
+                result = {"mode": "refresh", "rows": len(found)}
+                self.last_results["clients"] = result
+                return result
+
+            checkpoint = await self._load_checkpoint("clients")
+            # Se reanuda una carga interrumpida o se continúa desde el último cliente conocido
+            cursor = 0 if full else checkpoint.cursor
+            last_found = cursor
+            rows = 0 if full or checkpoint.status != "running" else checkpoint.rows
+            chunk = settings.sync_client_scan_chunk
+
+            refreshed = 0 if full else await self._refresh_stale_clients()
+
+            logger.info(f"Sincronizando clientes desde el ID {cursor + 1} (completa={full})")
+            while cursor - last_found < settings.sync_client_max_gap:
+                found = await self._fetch_clients(range(cursor + 1, cursor + chunk + 1))
+                if found:
+                    now = datetime.utcnow()
+                    await self._upsert(MirrorClient, [_client_row(item, now) for item in found.values()])
+                    last_found = max(last_found, max(found))
+                    rows += len(found)
+                cursor += chunk
+                await self._save_checkpoint("clients", cursor, "running", rows)
+
+            # Al terminar, la próxima sincronización incremental parte del último cliente encontrado
+            await self._save_checkpoint("clients", last_found, "done", rows)
+            result = {"mode": "full" if full else "incremental", "rows": rows, "last_id": last_found,
+                      "refreshed": refreshed}
+            self.last_results["clients"] = result
+            logger.info(f"Sincronización de clientes completada: {result}")
+            return result
+
+    async def _sync_invoice_pages(self, filters: Dict[str, Any], start_offset: int = 0,
+                                  checkpoint: Optional[str] = None, rows: int = 0) -> Tuple[int, int]:
+        """Copia páginas de facturas al espejo; retorna (offset final, filas acumuladas)"""
+        offset = start_offset
+        async for page in mikrowisp_client.iter_invoice_pages(filters, start_offset=start_offset):
+            now = datetime.utcnow()
+            await self._upsert(MirrorInvoice, [_invoice_row(item, now) for item in page if item.get("id")])
+            offset += len(page)
+            rows += len(page)
+            if checkpoint:
+                await self._save_checkpoint(checkpoint, offset, "running", rows)
+        return offset, rows
+
+    async def sync_invoices(self, full: bool = False, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Sincroniza facturas.
+
+        La carga completa pagina todas las facturas guardando el offset como
+        checkpoint. La incremental refresca las facturas no pagadas (las
+        únicas que cambian), incluidas las pagadas desde la última vez, y
+        continúa desde el offset guardado para traer las nuevas. Con
+        ``filters`` solo se sincroniza ese subconjunto.
+        """
+        async with self._locks["invoices"]:
+            await self._ensure_tables()
+
+            if filters:
+                _, rows = await self._sync_invoice_pages(filters)
+                result = {"mode": "filtered", "rows": rows}
+                self.last_results["invoices"] = result
+                return result
+
+            checkpoint = await self._load_checkpoint("invoices")
+            resuming = checkpoint.status == "running" and not full
+            start_offset = checkpoint.cursor if (resuming or (not full and checkpoint.status == "done")) else 0
+            rows = checkpoint.rows if resuming else 0
+
+            refreshed = 0
+            if not full and checkpoint.status == "done":
+                refreshed = await self._refresh_unpaid_invoices()
+
+            logger.info(f"Sincronizando facturas desde el offset {start_offset} (completa={full})")
+            offset, rows = await self._sync_invoice_pages({}, start_offset, "invoices", rows)
+            await self._save_checkpoint("invoices", offset, "done", rows)
+
+            result = {"mode": "full" if full else "incremental", "rows": rows, "offset": offset,
+                      "refreshed": refreshed}
+            self.last_results["invoices"] = result
+            logger.info(f"Sincronización de facturas completada: {result}")
+            return result
+
+    # Lecturas desde el espejo
+    async def get_client(self, client_id: int) -> Optional[Dict[str, Any]]:
+        """Datos de un cliente desde el espejo local"""
+        async with get_session_factory()() as session:
+            client = await session.get(MirrorClient, client_id)
+            return client.datos if client else None
+
+    async def stream_clients(self, since: Optional[datetime] = None,
+                             batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Recorre los clientes del espejo (opcionalmente solo los sincronizados desde ``since``)"""
+        query = select(MirrorClient)
+        if since is not None:
+            query = query.where(MirrorClient.synced_at >= since)
+        async with get_session_factory()() as session:
+            result = await session.stream_scalars(query.execution_options(yield_per=batch_size))
+            async for client in result:
+                yield client.datos
+
+    async def stream_invoice_columns(self, batch_size: int = 5000) -> AsyncIterator[Dict[str, Any]]:
+        """Recorre las columnas tipadas de las facturas del espejo (importes como Decimal, sin leer ``datos``)"""
+        query = select(
+            MirrorInvoice.id, MirrorInvoice.idcliente, MirrorInvoice.estado, MirrorInvoice.vencimiento,
+            MirrorInvoice.formapago, MirrorInvoice.total, MirrorInvoice.cobrado
+        )
+        async with get_session_factory()() as session:
+            result = await session.stream(query.execution_options(yield_per=batch_size))
+            async for row in result:
+                yield row._asdict()
+
+    async def get_clients(self, client_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Registros completos de clientes desde el espejo; los que faltan se piden a Mikrowisp"""
+        if not client_ids:
+            return {}
+        async with get_session_factory()() as session:
+            result = await session.execute(
+                select(MirrorClient.id, MirrorClient.datos).where(MirrorClient.id.in_(client_ids))
+            )
+            found = {client_id: datos for client_id, datos in result.all()}
+        missing = [client_id for client_id in client_ids if client_id not in found]
+        if missing:
+            found.update(await self._fetch_clients(missing))
+        return found
+
+    async def stream_invoices(self, batch_size: int = 5000) -> AsyncIterator[Dict[str, Any]]:
+        """Recorre todas las facturas del espejo sin cargarlas en memoria"""
+        async with get_session_factory()() as session:
+            result = await session.stream_scalars(
+                select(MirrorInvoice).execution_options(yield_per=batch_size)
+            )
+            async for invoice in result:
+                yield invoice.datos
+
+
+# Instancia global del motor de sincronización
+sync_engine = SyncEngine()
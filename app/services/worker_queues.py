@@ -0,0 +1,134 @@
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import pika
+
+from app.config.settings import settings
+
+# Headers que el worker agrega al reintentar o descartar un mensaje
+ATTEMPTS_HEADER = "x-attempts"
+ERROR_HEADER = "x-last-error"
+FAILED_AT_HEADER = "x-failed-at"
+ORIGIN_HEADER = "x-original-queue"
+# Momento (epoch en milisegundos) en que el enrutador publicó el mensaje en su carril
+ROUTED_AT_HEADER = "x-routed-at-ms"
+
+# Longitud máxima del error guardado en el header
+MAX_ERROR_LENGTH = 500
+
+
+def retry_queue_name(delay: int) -> str:
+    return f"{settings.rabbitmq_queue}.retry.{delay}s"
+
+
+def dead_letter_queue_name() -> str:
+    return f"{settings.rabbitmq_queue}.dead"
+
+
+def lane_queue_name(lane: str) -> str:
+    return f"{settings.rabbitmq_queue}.lane.{lane}"
+
+
+def lane_for(message_type: Optional[str]) -> str:
+    """Carril de prioridad de un tipo de mensaje (el carril por defecto si no tiene uno válido)"""
+    lane = settings.worker_lane_by_type.get(message_type)
+    return lane if lane in settings.worker_lanes else settings.worker_default_lane
+
+
+def retry_queue_arguments(delay: int) -> Dict[str, Any]:
+    """Cola de espera: al vencer el TTL el mensaje vuelve a la cola principal.
+
+    El TTL es de la cola (no por mensaje) para que cada nivel sea FIFO y un
+    mensaje con espera larga no bloquee a los de espera corta.
+    """
+    return {
+        "x-message-ttl": delay * 1000,
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": settings.rabbitmq_queue,
+    }
+
+
+def declare_queues(channel, callback=None) -> None:
+    """Declara las colas de cada carril, las de reintento y la dead-letter queue.
+
+    ``callback`` se invoca cuando la última declaración fue confirmada.
+    """
+    queues = [(lane_queue_name(lane), None) for lane in settings.worker_lanes]
+    queues += [(retry_queue_name(delay), retry_queue_arguments(delay)) for delay in settings.worker_retry_delays]
+    queues.append((dead_letter_queue_name(), None))
+    for index, (name, arguments) in enumerate(queues):
+        channel.queue_declare(
+            queue=name,
+            durable=True,
+            arguments=arguments,
+            callback=callback if index == len(queues) - 1 else None
+        )
+
+
+def attempts(properties: Optional[pika.BasicProperties]) -> int:
+    """Intentos ya fallidos de un mensaje según su header"""
+    headers = (properties.headers if properties is not None else None) or {}
+    try:
+        return int(headers.get(ATTEMPTS_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def failure_destination(properties: Optional[pika.BasicProperties]) -> Tuple[str, int, bool]:
+    """Cola a la que va un mensaje que acaba de fallar.
+
+    Retorna ``(cola, intentos, es_dead_letter)``: los primeros fallos van al
+    nivel de reintento correspondiente y, al llegar a ``worker_max_attempts``,
+    a la dead-letter queue.
+    """
+    failed = attempts(properties) + 1
+    delays = settings.worker_retry_delays
+    if failed >= settings.worker_max_attempts or not delays:
+        return dead_letter_queue_name(), failed, True
+    return retry_queue_name(delays[min(failed, len(delays)) - 1]), failed, False
+
+
+def lane_properties(properties: Optional[pika.BasicProperties]) -> pika.BasicProperties:
+    """Propiedades del mensaje al enrutarlo a su carril (conserva los headers de reintento)"""
+    headers = dict((properties.headers if properties is not None else None) or {})
+    headers[ROUTED_AT_HEADER] = int(time.time() * 1000)
+    return _copy_properties(properties, headers)
+
+
+def queued_at(properties: Optional[pika.BasicProperties]) -> Optional[float]:
+    """Momento en que el mensaje entró a su carril (o su timestamp AMQP si se publicó directo)"""
+    if properties is None:
+        return None
+    routed_at = (properties.headers or {}).get(ROUTED_AT_HEADER)
+    if routed_at is not None:
+        try:
+            return int(routed_at) / 1000
+        except (TypeError, ValueError):
+            pass
+    return float(properties.timestamp) if properties.timestamp else None
+
+
+def failure_properties(properties: Optional[pika.BasicProperties], failed: int,
+                       error: str) -> pika.BasicProperties:
+    """Copia las propiedades del mensaje con los headers de reintento actualizados"""
+    headers = dict((properties.headers if properties is not None else None) or {})
+    headers[ATTEMPTS_HEADER] = failed
+    headers[ERROR_HEADER] = error[:MAX_ERROR_LENGTH]
+    headers[FAILED_AT_HEADER] = int(time.time())
+    headers.setdefault(ORIGIN_HEADER, settings.rabbitmq_queue)
+    return _copy_properties(properties, headers)
+
+
+def _copy_properties(properties: Optional[pika.BasicProperties], headers: Dict[str, Any]) -> pika.BasicProperties:
+    properties = properties or pika.BasicProperties()
+    return pika.BasicProperties(
+        content_type=properties.content_type or "application/json",
+        message_id=properties.message_id,
+        correlation_id=properties.correlation_id,
+        timestamp=properties.timestamp,
+        type=properties.type,
+        app_id=properties.app_id,
+        priority=properties.priority,
+        delivery_mode=2,
+        headers=headers,
+    )
@@ -0,0 +1,45 @@
+import json
+from typing import Any, Union
+import logging
+
+from fastapi.responses import JSONResponse
+
+from app.config.settings import settings
+from app.utils.server_timing import span
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+# Backend efectivo: "orjson" solo si se pidió en Settings y está instalado
+if settings.json_backend == "orjson" and orjson is None:
+    logger.warning("JSON_BACKEND=orjson pero orjson no está instalado; se usa json de la stdlib")
+BACKEND = "orjson" if settings.json_backend == "orjson" and orjson is not None else "stdlib"
+
+# Error de decodificación común a ambos backends (orjson.JSONDecodeError hereda de ValueError)
+JSONDecodeError = ValueError
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Decodifica JSON desde bytes o texto"""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializa a JSON compacto en UTF-8 (mismo formato que ``JSONResponse``)"""
+    if BACKEND == "orjson":
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` que serializa con el backend configurado"""
+
+    def render(self, content: Any) -> bytes:
+        with span("render"):
+            return dumps(content)
@@ -0,0 +1,43 @@
+from fastapi import HTTPException, status
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def validate_mikrowisp_response(response: Dict[str, Any]) -> None:
+    """Valida la respuesta de Mikrowisp y lanza excepción si hay error"""
+
+    if not isinstance(response, dict):
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Respuesta inválida de Mikrowisp"
+        )
+
+    estado = response.get("estado", "").lower()
+
+    if estado != "exito":
+        mensaje = response.get("mensaje", "Error desconocido en Mikrowisp")
+        logger.warning(f"Error en Mikrowisp: {mensaje}")
+
+        # Mapear errores específicos de Mikrowisp a códigos HTTP apropiados
+        if "no encontrado" in mensaje.lower():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=mensaje
+            )
+        elif "ya existe" in mensaje.lower():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=mensaje
+            )
+        elif "inválido" in mensaje.lower() or "incorrecto" in mensaje.lower():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=mensaje
+            )
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=mensaje
+            )
@@ -0,0 +1,80 @@
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional
+
+# Spans de la petición en curso: nombre -> [duración acumulada (s), llamadas].
+# None cuando Server-Timing está desactivado o fuera de una petición.
+_spans_var: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("server_timing_spans", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    __slots__ = ("spans", "name", "start")
+
+    def __init__(self, spans: Dict[str, List[float]], name: str):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        entry = self.spans.get(self.name)
+        if entry is None:
+            self.spans[self.name] = [elapsed, 1]
+        else:
+            entry[0] += elapsed
+            entry[1] += 1
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    """Mide un bloque ``with`` dentro de la petición actual; sin petición activa no hace nada.
+
+    Las llamadas repetidas con el mismo nombre se acumulan. Las tareas
+    creadas durante la petición heredan el contexto y registran en el
+    mismo diccionario.
+    """
+    spans = _spans_var.get()
+    if spans is None:
+        return _NOOP
+    return _Span(spans, name)
+
+
+def start_request() -> Token:
+    return _spans_var.set({})
+
+
+def end_request(token: Token) -> Dict[str, List[float]]:
+    """Retorna los spans de la petición y limpia el contexto"""
+    spans = _spans_var.get() or {}
+    _spans_var.reset(token)
+    return spans
+
+
+def current_spans() -> Dict[str, List[float]]:
+    return _spans_var.get() or {}
+
+
+def format_header(spans: Dict[str, List[float]], total: float) -> str:
+    """Valor del header ``Server-Timing`` (duraciones en ms)"""
+    parts = [
+        f'{name};dur={duration * 1000:.2f};desc="{int(count)}x"' if count > 1 else f"{name};dur={duration * 1000:.2f}"
+        for name, (duration, count) in spans.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
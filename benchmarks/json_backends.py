@@ -0,0 +1,131 @@
+"""Compara json (stdlib) y orjson sobre payloads representativos de Mikrowisp.
+
+Uso:
+    python benchmarks/json_backends.py [--repeat N]
+
+Mide decodificación (respuesta de Mikrowisp / mensaje del worker) y
+codificación (cuerpo de respuesta de la API) con los mismos parámetros que
+``app.utils.json_codec``.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def client_details(count: int) -> Dict[str, Any]:
+    """Respuesta de GetClientsDetails"""
+    return {
+        "estado": "exito",
+        "datos": [{
+            "id": i,
+            "nombre": f"Cliente Número {i} Pérez",
+            "estado": random.choice(["ACTIVO", "SUSPENDIDO"]),
+            "correo": f"cliente{i}@correo.ec",
+            "telefono": f"0{random.randint(200000000, 299999999)}",
+            "movil": f"09{random.randint(10000000, 99999999)}",
+            "cedula": f"{random.randint(1000000000, 1799999999)}",
+            "direccion_principal": "Av. Amazonas y Naciones Unidas, Quito",
+            "facturacion": {"tipo_factura": 1, "dias_gracia": 3, "fecha_corte": "2026-10-01"},
+            "servicios": [{"id": i, "idperfil": 3, "ip": f"10.0.{i % 255}.{i % 250}", "perfil": "PLAN 50MB"}],
+        } for i in range(count)]
+    }
+
+
+def invoices(count: int) -> Dict[str, Any]:
+    """Respuesta de GetInvoices"""
+    return {
+        "estado": "exito",
+        "facturas": [{
+            "id": i,
+            "legal": 0,
+            "idcliente": random.randint(1, 20000),
+            "emitido": "2026-09-01",
+            "vencimiento": "2026-09-15",
+            "total": f"{random.uniform(15, 80):.2f}",
+            "estado": random.choice(["pagado", "No pagado", "anulado"]),
+            "cobrado": f"{random.uniform(0, 80):.2f}",
+            "impuesto": "0.00",
+            "formapago": random.choice(["Efectivo", "Transferencia", ""]),
+            "fechapago": "2026-09-10",
+            "total2": "25.00",
+            "subtotal": "25.00",
+        } for i in range(count)]
+    }
+
+
+def routers(count: int) -> Dict[str, Any]:
+    """Respuesta de GetRouters"""
+    return {
+        "estado": "exito",
+        "routers": [{
+            "id": i,
+            "nombre": f"RB-{i}",
+            "ip": f"172.16.{i // 255}.{i % 255}",
+            "estado": random.choice(["ONLINE", "OFFLINE"]),
+            "clientes": random.randint(0, 400),
+            "cpu": random.randint(0, 100),
+            "uptime": "3d 04:12:55",
+        } for i in range(count)]
+    }
+
+
+def worker_message() -> Dict[str, Any]:
+    """Mensaje típico de la cola del worker"""
+    return {"type": "client_query", "data": {"client_id": 1234, "query": "¿Cuándo vence mi factura?"}}
+
+
+def stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def bench(func: Callable[[], Any], repeat: int) -> float:
+    """Mejor tiempo (ms) de ``repeat`` ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    payloads: List[Tuple[str, Any]] = [
+        ("cliente (1)", client_details(1)),
+        ("clientes (500)", client_details(500)),
+        ("facturas (5000)", invoices(5000)),
+        ("routers (2000)", routers(2000)),
+        ("mensaje worker", worker_message()),
+    ]
+
+    print(f"orjson: {orjson.__version__ if orjson else 'no instalado'}")
+    print(f"{'payload':<18}{'KiB':>8}  {'op':<7}{'stdlib ms':>11}{'orjson ms':>11}{'x':>7}")
+    for name, payload in payloads:
+        body = stdlib_dumps(payload)
+        # Operaciones pequeñas se repiten para que el tiempo sea medible
+        loops = 1000 if len(body) < 4096 else 1
+        cases = [
+            ("loads", lambda: [json.loads(body) for _ in range(loops)],
+             lambda: [orjson.loads(body) for _ in range(loops)]),
+            ("dumps", lambda: [stdlib_dumps(payload) for _ in range(loops)],
+             lambda: [orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS) for _ in range(loops)]),
+        ]
+        for op, std, fast in cases:
+            std_ms = bench(std, args.repeat) / loops
+            fast_ms = bench(fast, args.repeat) / loops if orjson else float("nan")
+            print(f"{name:<18}{len(body) / 1024:>8.1f}  {op:<7}{std_ms:>11.4f}{fast_ms:>11.4f}{std_ms / fast_ms:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
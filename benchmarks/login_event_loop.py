@@ -0,0 +1,82 @@
+"""Latencia del event loop durante inicios de sesión concurrentes.
+
+Uso (con las variables de entorno de la app, p.ej. desde .env):
+    python benchmarks/login_event_loop.py [--logins N] [--rounds R]
+
+Un "ticker" duerme 5 ms en bucle y registra cuánto se retrasa cada
+despertar: ese retraso es lo que sufre cualquier otra petición de la API.
+Se compara bcrypt llamado directamente en el event loop con
+``CredentialStore.authenticate`` (pool de hilos acotado + límite de
+logins). El usuario se sirve desde memoria para medir solo bcrypt.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+
+from app.services.credential_store import credential_store
+
+TICK = 0.005
+
+
+async def ticker(lags, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def measure(name: str, login, logins: int) -> None:
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick_task
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(f"{name:<28}{elapsed:>8.2f} s  lag p50 {statistics.median(lags_ms):>7.2f} ms  "
+          f"p99 {p99:>8.2f} ms  max {lags_ms[-1]:>8.2f} ms  ok {sum(bool(r) for r in results)}/{logins}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    password = "contraseña-segura"
+    password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt(args.rounds)).decode()
+    user = {"username": "bench", "password_hash": password_hash, "email": "", "is_admin": False,
+            "client_id": None}
+
+    async def get_user(username):
+        return user
+
+    credential_store.get_user = get_user
+
+    async def inline_login():
+        return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+    async def store_login():
+        return await credential_store.authenticate("bench", password)
+
+    print(f"{args.logins} logins concurrentes, bcrypt rounds={args.rounds}")
+    await measure("bcrypt en el event loop", inline_login, args.logins)
+    await measure("CredentialStore", store_login, args.logins)
+    credential_store.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""Mide el overhead por petición de LoggingMiddleware.
+
+Uso (con las variables de entorno de la app, p.ej. desde .env):
+    python benchmarks/middleware_overhead.py [--requests N] [--log-level INFO]
+
+Compara una app Starlette mínima sin middleware, con la implementación
+anterior basada en ``BaseHTTPMiddleware`` y con el middleware ASGI actual,
+invocando la app ASGI directamente (sin red). También mide el tiempo hasta
+el primer chunk de una respuesta en streaming.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.middleware.logging import LoggingMiddleware
+
+logger = logging.getLogger("app.middleware.logging")
+
+
+class BaseHTTPLoggingMiddleware(BaseHTTPMiddleware):
+    """Implementación anterior, conservada solo para comparar"""
+
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        start_time = time.time()
+        logger.info(
+            f"[{request_id}] {request.method} {request.url.path} - "
+            f"Client: {request.client.host if request.client else 'unknown'}"
+        )
+        try:
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            logger.info(f"[{request_id}] {response.status_code} - Processed in {process_time:.4f}s")
+            response.headers["X-Request-ID"] = request_id
+            return response
+        except Exception as e:
+            logger.error(f"[{request_id}] ERROR: {str(e)}")
+            return JSONResponse(status_code=500, content={"detail": "Error interno del servidor"})
+
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+
+async def stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield b"chunk\n"
+            await asyncio.sleep(0.05)
+    return StreamingResponse(chunks())
+
+
+def build_app(middleware_class=None) -> Starlette:
+    middleware = [Middleware(middleware_class)] if middleware_class else []
+    return Starlette(routes=[Route("/ok", ok), Route("/stream", stream)], middleware=middleware)
+
+
+def make_scope(path: str):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 5000),
+        "server": ("bench", 80),
+    }
+
+
+def make_receive():
+    """Entrega el cuerpo vacío y luego espera, como un cliente que sigue conectado"""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def per_request_us(app, requests: int) -> float:
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(make_scope("/ok"), make_receive(), send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(make_scope("/ok"), make_receive(), send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def first_chunk_ms(app) -> float:
+    start = time.perf_counter()
+    first = None
+
+    async def send(message):
+        nonlocal first
+        if message["type"] == "http.response.body" and message.get("body") and first is None:
+            first = time.perf_counter() - start
+
+    await app(make_scope("/stream"), make_receive(), send)
+    return first * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, stream=open(os.devnull, "w"))
+
+    apps = [
+        ("sin middleware", build_app()),
+        ("BaseHTTPMiddleware", build_app(BaseHTTPLoggingMiddleware)),
+        ("ASGI", build_app(LoggingMiddleware)),
+    ]
+    print(f"log level {args.log_level}, {args.requests} peticiones")
+    baseline = None
+    for name, app in apps:
+        us = await per_request_us(app, args.requests)
+        baseline = us if baseline is None else baseline
+        await first_chunk_ms(app)
+        chunk = await first_chunk_ms(app)
+        print(f"{name:<20}{us:>9.1f} µs/petición  overhead {us - baseline:>7.1f} µs  "
+              f"primer chunk {chunk:>6.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
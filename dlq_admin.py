@@ -0,0 +1,114 @@
+"""Inspección y reenvío de la dead-letter queue del worker.
+
+Uso:
+    python dlq_admin.py list [--limit N]
+    python dlq_admin.py replay [--limit N] [--type TIPO]
+    python dlq_admin.py purge
+
+``list`` muestra los mensajes sin sacarlos de la cola. ``replay`` los
+publica de nuevo en la cola principal con el contador de intentos en
+cero (opcionalmente solo los de un tipo). ``purge`` vacía la cola.
+"""
+import argparse
+import sys
+from datetime import datetime
+
+import pika
+
+from app.config.settings import settings
+from app.services import worker_queues
+from app.utils import json_codec
+
+
+def fetch(channel, limit: int):
+    """Obtiene hasta ``limit`` mensajes sin confirmarlos"""
+    queue = worker_queues.dead_letter_queue_name()
+    for _ in range(limit):
+        method, properties, body = channel.basic_get(queue=queue, auto_ack=False)
+        if method is None:
+            return
+        yield method, properties, body
+
+
+def message_type(body: bytes) -> str:
+    try:
+        return json_codec.loads(body).get("type", "unknown")
+    except (json_codec.JSONDecodeError, AttributeError):
+        return "invalid"
+
+
+def describe(properties, body: bytes) -> dict:
+    headers = properties.headers or {}
+    failed_at = headers.get(worker_queues.FAILED_AT_HEADER)
+    return {
+        "type": message_type(body),
+        "message_id": properties.message_id,
+        "attempts": headers.get(worker_queues.ATTEMPTS_HEADER),
+        "error": headers.get(worker_queues.ERROR_HEADER),
+        "failed_at": datetime.utcfromtimestamp(failed_at).isoformat() if failed_at else None,
+        "body": body[:500].decode("utf-8", errors="replace"),
+    }
+
+
+def list_messages(channel, limit: int) -> None:
+    count = 0
+    for _, properties, body in fetch(channel, limit):
+        print(json_codec.dumps(describe(properties, body)).decode())
+        count += 1
+    # Los mensajes sin confirmar vuelven a la cola al cerrar el canal
+    print(f"{count} mensajes en la dead-letter queue (mostrados sin retirar)", file=sys.stderr)
+
+
+def replay_messages(channel, limit: int, only_type: str = None) -> None:
+    channel.confirm_delivery()
+    replayed = 0
+    for method, properties, body in fetch(channel, limit):
+        if only_type and message_type(body) != only_type:
+            continue
+        headers = {
+            key: value for key, value in (properties.headers or {}).items()
+            if key not in (worker_queues.ATTEMPTS_HEADER, "x-death")
+        }
+        headers["x-replayed-at"] = int(datetime.utcnow().timestamp())
+        channel.basic_publish(
+            exchange="",
+            routing_key=settings.rabbitmq_queue,
+            body=body,
+            properties=pika.BasicProperties(
+                content_type=properties.content_type,
+                message_id=properties.message_id,
+                correlation_id=properties.correlation_id,
+                priority=properties.priority,
+                delivery_mode=2,
+                headers=headers,
+            )
+        )
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        replayed += 1
+    print(f"{replayed} mensajes reenviados a {settings.rabbitmq_queue}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["list", "replay", "purge"])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--type", dest="only_type", default=None)
+    args = parser.parse_args()
+
+    connection = pika.BlockingConnection(pika.URLParameters(settings.rabbitmq_url))
+    channel = connection.channel()
+    channel.queue_declare(queue=worker_queues.dead_letter_queue_name(), durable=True)
+    try:
+        if args.command == "list":
+            list_messages(channel, args.limit)
+        elif args.command == "replay":
+            replay_messages(channel, args.limit, args.only_type)
+        else:
+            frame = channel.queue_purge(queue=worker_queues.dead_letter_queue_name())
+            print(f"{frame.method.message_count} mensajes eliminados", file=sys.stderr)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Supervisor multiproceso del worker de RabbitMQ.
+
+Uso:
+    python supervisor.py [--workers N] [--port PUERTO]
+
+Arranca N procesos ``worker.py`` (por defecto uno por CPU), los reinicia
+con backoff exponencial si terminan inesperadamente o si dejan de
+reportar o siguen desconectados de RabbitMQ, y, ante SIGTERM o
+SIGINT, les reenvía SIGTERM para que drenen sus mensajes en vuelo antes
+de salir. ``GET /health`` en ``SUPERVISOR_HOST:SUPERVISOR_PORT`` reporta
+el estado y el throughput de cada proceso.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import settings
+from app.utils import json_codec
+
+logger = logging.getLogger("supervisor")
+
+# Un proceso que vivió al menos esto se considera estable y reinicia su backoff
+STABLE_AFTER = 60.0
+
+
+def run_worker(index: int, status_queue) -> None:
+    """Punto de entrada de cada proceso hijo"""
+    import worker
+
+    def report(stats: Dict[str, Any]) -> None:
+        try:
+            status_queue.put_nowait((index, os.getpid(), time.time(), stats))
+        except queue.Full:
+            pass
+
+    asyncio.run(worker.main(on_stats=report))
+
+
+class WorkerSlot:
+    """Estado de un proceso hijo y de sus reinicios"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.next_start = 0.0
+        self.last_exitcode: Optional[int] = None
+        self.last_report = 0.0
+        self.disconnected_since = 0.0
+        self.terminated_at = 0.0
+        self.stats: Dict[str, Any] = {}
+        self.throughput = 0.0
+
+    def record(self, reported_at: float, stats: Dict[str, Any]) -> None:
+        """Guarda un reporte del hijo y calcula mensajes/s desde el anterior"""
+        elapsed = reported_at - self.last_report
+        if self.last_report and elapsed > 0:
+            done = stats["processed"] + stats["failed"] - self.stats["processed"] - self.stats["failed"]
+            self.throughput = done / elapsed
+        if stats.get("connected"):
+            self.disconnected_since = 0.0
+        elif not self.disconnected_since:
+            self.disconnected_since = reported_at
+        self.last_report = reported_at
+        self.stats = stats
+
+    def problem(self, now: float) -> Optional[str]:
+        """Motivo por el que un hijo vivo está degradado, o None si está sano.
+
+        Antes del primer reporte se mide desde el arranque, y un hijo que
+        nunca se conectó también cuenta como desconectado desde entonces.
+        """
+        if self.process is None or not self.process.is_alive():
+            return "stopped"
+        if now - (self.last_report or self.started_at) > settings.supervisor_stale_after:
+            return "stale"
+        disconnected_since = self.disconnected_since if self.last_report else self.started_at
+        if disconnected_since and now - disconnected_since > settings.supervisor_disconnected_grace:
+            return "disconnected"
+        return None
+
+    def describe(self) -> Dict[str, Any]:
+        alive = self.process is not None and self.process.is_alive()
+        return {
+            "index": self.index,
+            "pid": self.process.pid if alive else None,
+            "alive": alive,
+            "problem": self.problem(time.time()),
+            "uptime": round(time.time() - self.started_at, 1) if alive else 0.0,
+            "restarts": self.restarts,
+            "last_exitcode": self.last_exitcode,
+            "report_age": round(time.time() - self.last_report, 1) if self.last_report else None,
+            "throughput": round(self.throughput, 2),
+            "stats": self.stats,
+        }
+
+
+class Supervisor:
+    """Mantiene N procesos worker vivos y expone su estado por HTTP local"""
+
+    def __init__(self, workers: int, host: str, port: int):
+        self._context = multiprocessing.get_context("spawn")
+        self._status_queue = self._context.Queue(maxsize=1000)
+        self.slots: List[WorkerSlot] = [WorkerSlot(index) for index in range(workers)]
+        self.host = host
+        self.port = port
+        self._stopping = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start_child(self, slot: WorkerSlot) -> None:
+        slot.process = self._context.Process(
+            target=run_worker, args=(slot.index, self._status_queue), name=f"worker-{slot.index}"
+        )
+        slot.process.start()
+        slot.started_at = time.time()
+        slot.last_report = 0.0
+        slot.disconnected_since = 0.0
+        slot.terminated_at = 0.0
+        slot.stats = {}
+        slot.throughput = 0.0
+        logger.info(f"Worker {slot.index} iniciado (pid {slot.process.pid})")
+
+    def check_child(self, slot: WorkerSlot) -> None:
+        """Detiene los hijos degradados y programa el reinicio de los terminados, con backoff exponencial"""
+        now = time.time()
+        if slot.process is not None and slot.process.is_alive():
+            if slot.terminated_at:
+                # Ya recibió SIGTERM: se le da el tiempo de drenado antes de forzar la salida
+                if now - slot.terminated_at > settings.worker_drain_timeout + 5:
+                    logger.warning(f"Worker {slot.index} no terminó a tiempo, forzando salida")
+                    slot.process.kill()
+            else:
+                problem = slot.problem(now)
+                if problem is not None:
+                    logger.warning(f"Worker {slot.index} degradado ({problem}), reiniciándolo")
+                    slot.terminated_at = now
+                    slot.process.terminate()
+
+        if slot.process is not None and not slot.process.is_alive():
+            slot.process.join()
+            slot.last_exitcode = slot.process.exitcode
+            self._cleanup_metrics(slot.process.pid)
+            lived = now - slot.started_at
+            slot.failures = 1 if lived >= STABLE_AFTER else slot.failures + 1
+            delay = min(
+                settings.supervisor_restart_backoff_max,
+                settings.supervisor_restart_backoff_base * 2 ** (slot.failures - 1)
+            )
+            logger.warning(
+                f"Worker {slot.index} terminó (código {slot.last_exitcode}, vivió {lived:.1f}s), "
+                f"reiniciando en {delay:.1f}s"
+            )
+            slot.process = None
+            slot.next_start = now + delay
+
+        if slot.process is None and now >= slot.next_start:
+            slot.restarts += 1
+            self.start_child(slot)
+
+    @staticmethod
+    def _cleanup_metrics(pid: int) -> None:
+        if settings.prometheus_multiproc_dir:
+            from app.services.metrics import mark_process_dead
+            mark_process_dead(pid)
+
+    def drain_reports(self) -> None:
+        while True:
+            try:
+                index, pid, reported_at, stats = self._status_queue.get_nowait()
+            except queue.Empty:
+                return
+            slot = self.slots[index]
+            if slot.process is not None and slot.process.pid == pid:
+                slot.record(reported_at, stats)
+
+    def health(self) -> Dict[str, Any]:
+        workers = [slot.describe() for slot in self.slots]
+        alive = sum(1 for worker in workers if worker["alive"])
+        healthy = sum(1 for worker in workers if worker["problem"] is None)
+        return {
+            "status": "healthy" if healthy == len(workers) else "degraded" if healthy else "down",
+            "workers_alive": alive,
+            "workers_healthy": healthy,
+            "workers_total": len(workers),
+            "throughput": round(sum(worker["throughput"] for worker in workers), 2),
+            "in_flight": sum(worker["stats"].get("in_flight", 0) for worker in workers),
+            "processed": sum(worker["stats"].get("processed", 0) for worker in workers),
+            "failed": sum(worker["stats"].get("failed", 0) for worker in workers),
+            "workers": workers,
+        }
+
+    def serve_health(self) -> None:
+        supervisor = self
+
+        class HealthHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/health":
+                    self.send_error(404)
+                    return
+                health = supervisor.health()
+                body = json_codec.dumps(health)
+                self.send_response(200 if health["status"] == "healthy" else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), HealthHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="supervisor-health", daemon=True).start()
+        logger.info(f"Salud del supervisor en http://{self.host}:{self.port}/health")
+
+    def stop(self, signum=None, frame=None) -> None:
+        self._stopping.set()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.serve_health()
+        for slot in self.slots:
+            self.start_child(slot)
+
+        while not self._stopping.wait(0.5):
+            self.drain_reports()
+            for slot in self.slots:
+                self.check_child(slot)
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        """Envía SIGTERM a los hijos y espera a que drenen; mata los que no terminan"""
+        logger.info("Deteniendo workers...")
+        children = [slot.process for slot in self.slots if slot.process is not None and slot.process.is_alive()]
+        for process in children:
+            process.terminate()
+
+        deadline = time.time() + settings.worker_drain_timeout + 5
+        for process in children:
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                logger.warning(f"Worker pid {process.pid} no terminó a tiempo, forzando salida")
+                process.kill()
+                process.join()
+            self._cleanup_metrics(process.pid)
+
+        if self._server is not None:
+            self._server.shutdown()
+        logger.info("Supervisor detenido")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=settings.supervisor_workers)
+    parser.add_argument("--port", type=int, default=settings.supervisor_port)
+    args = parser.parse_args()
+
+    from app.config.logging import setup_logging
+    setup_logging()
+
+    workers = args.workers or os.cpu_count() or 1
+    logger.info(f"Iniciando supervisor con {workers} workers")
+    Supervisor(workers, settings.supervisor_host, args.port).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,77 @@
 import asyncio
-import json
+import functools
 import logging
+import signal
+import time
+from collections import defaultdict
+from contextvars import ContextVar
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 import pika
 from pika.adapters.asyncio_connection import AsyncioConnection
 
 from app.config.settings import settings
+from app.config.logging import setup_logging
+from app.services.concurrency import AdaptiveLimiter
+from app.services.dedup_store import DONE, IN_PROGRESS, dedup_store
+from app.services.metrics import worker_lane_wait, worker_message_duration
 from app.services.mikrowisp_client import mikrowisp_client
 from app.services.openai_service import openai_service
 from app.services.n8n_service import n8n_service
+from app.services.sync_engine import sync_engine
+from app.services import worker_queues
+from app.services.database import dispose_engine
+from app.utils import json_codec
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Segundos de espera antes de reconectar a RabbitMQ
+RECONNECT_DELAY = 5
+
+# Efectos externos ya realizados por el mensaje en curso (p.ej. el SMS enviado)
+_side_effects: ContextVar[Optional[List[str]]] = ContextVar("worker_side_effects", default=None)
+
+
+def mark_side_effect(step: str) -> None:
+    """Registra que el mensaje en curso ya produjo un efecto que no debe repetirse"""
+    effects = _side_effects.get()
+    if effects is not None:
+        effects.append(step)
+
 
 class MikrowispWorker:
-    """Worker para procesar mensajes de RabbitMQ"""
+    """Worker para procesar mensajes de RabbitMQ.
+
+    La cola principal es solo de entrada: cada mensaje se reenvía a la cola
+    del carril de su tipo (``worker_lane_by_type``). Cada carril se consume
+    en su propio canal con prefetch igual a su presupuesto
+    (``worker_lanes``), así una sincronización masiva espera en su cola sin
+    ocupar los turnos de las consultas de clientes.
+
+    pika entrega los mensajes en un callback síncrono sobre el mismo event
+    loop; cada mensaje se agenda como tarea y se procesa concurrentemente,
+    con un límite adicional por tipo. El ack/nack se hace al terminar cada
+    tarea, en el hilo del loop, y solo si el canal que entregó el mensaje
+    sigue abierto.
+    """
 
     def __init__(self):
         self.connection = None
         self.channel = None
-        self.should_reconnect = False
+        self.stopping = False
         self.was_consuming = False
+        self._consumers: List[Tuple[Any, str]] = []
+        self._lane_channels: Dict[str, Any] = {}
+        self._lane_in_flight: Dict[str, int] = defaultdict(int)
+        self._tasks: Set[asyncio.Task] = set()
+        self.processed: Dict[str, int] = defaultdict(int)
+        self.failed: Dict[str, int] = defaultdict(int)
+        self.started_at = time.time()
+        self._limiters = {
+            message_type: AdaptiveLimiter(f"worker.{message_type}", max_limit=limit, min_limit=limit)
+            for message_type, limit in settings.worker_type_concurrency.items()
+        }
 
     async def connect(self):
         """Conecta a RabbitMQ"""
@@ -42,15 +92,17 @@ class MikrowispWorker:
 
     def on_connection_open_error(self, _unused_connection, err):
         """Callback cuando falla la conexión"""
-        logger.error(f"Error conectando a RabbitMQ: {err}")
-        self.reconnect()
+        logger.error(f"Error conectando a RabbitMQ, reintentando en {RECONNECT_DELAY}s: {err}")
+        self.schedule_reconnect()
 
     def on_connection_closed(self, _unused_connection, reason):
-        """Callback cuando se cierra la conexión"""
+        """Callback cuando se cierra la conexión: reconecta salvo que el worker se esté deteniendo"""
         self.channel = None
-        if self.should_reconnect:
-            logger.warning(f"Conexión cerrada, reconectando en 5s: {reason}")
-            self.connection.ioloop.call_later(5, self.reconnect)
+        self._lane_channels.clear()
+        self._consumers.clear()
+        if not self.stopping:
+            logger.warning(f"Conexión cerrada, reconectando en {RECONNECT_DELAY}s: {reason}")
+            self.schedule_reconnect()
 
     def on_channel_open(self, channel):
         """Callback cuando el canal se abre"""
@@ -75,8 +127,13 @@ class MikrowispWorker:
 
     def on_queue_declareok(self, _unused_frame):
         """Callback cuando la cola está declarada"""
-        logger.info("Cola declarada, configurando QoS")
-        self.channel.basic_qos(prefetch_count=1, callback=self.on_basic_qos_ok)
+        logger.info("Cola declarada, declarando colas de reintento y dead-letter")
+        worker_queues.declare_queues(self.channel, callback=self.on_retry_queues_declareok)
+
+    def on_retry_queues_declareok(self, _unused_frame):
+        """Callback cuando las colas de carriles y reintento están declaradas"""
+        logger.info(f"Colas de carriles y reintento declaradas, configurando QoS (prefetch={settings.worker_concurrency})")
+        self.channel.basic_qos(prefetch_count=settings.worker_concurrency, callback=self.on_basic_qos_ok)
 
     def on_basic_qos_ok(self, _unused_frame):
         """Callback cuando QoS está configurado"""
@@ -84,34 +141,201 @@ class MikrowispWorker:
         self.start_consuming()
 
     def start_consuming(self):
-        """Inicia el consumo de mensajes"""
+        """Inicia el enrutamiento de la cola principal y abre un canal por carril"""
         logger.info("Iniciando consumo de mensajes")
         self.was_consuming = True
-        self.channel.basic_consume(
+        self._consumers.append((self.channel, self.channel.basic_consume(
             queue=settings.rabbitmq_queue,
+            on_message_callback=self.on_route
+        )))
+        for lane in settings.worker_lanes:
+            self.connection.channel(on_open_callback=functools.partial(self.on_lane_channel_open, lane))
+
+    def on_lane_channel_open(self, lane: str, channel):
+        """Callback cuando se abre el canal de un carril: QoS con su presupuesto"""
+        self._lane_channels[lane] = channel
+        channel.add_on_close_callback(functools.partial(self.on_lane_channel_closed, lane))
+        channel.basic_qos(
+            prefetch_count=settings.worker_lanes[lane],
+            callback=functools.partial(self.on_lane_qos_ok, lane, channel)
+        )
+
+    def on_lane_qos_ok(self, lane: str, channel, _unused_frame):
+        """Callback cuando el QoS del carril está configurado"""
+        logger.info(f"Consumiendo carril {lane} (prefetch={settings.worker_lanes[lane]})")
+        self._consumers.append((channel, channel.basic_consume(
+            queue=worker_queues.lane_queue_name(lane),
             on_message_callback=self.on_message
+        )))
+
+    def on_lane_channel_closed(self, lane: str, channel, reason):
+        """Callback cuando se cierra el canal de un carril: lo reabre si la conexión sigue en pie"""
+        if self._lane_channels.get(lane) is channel:
+            del self._lane_channels[lane]
+        self._consumers = [(ch, tag) for ch, tag in self._consumers if ch is not channel]
+        if self.stopping or self.connection is None or not self.connection.is_open:
+            logger.warning(f"Canal del carril {lane} cerrado: {reason}")
+            return
+        logger.warning(f"Canal del carril {lane} cerrado, reabriéndolo en {RECONNECT_DELAY}s: {reason}")
+        asyncio.get_running_loop().call_later(RECONNECT_DELAY, self.reopen_lane, lane)
+
+    def reopen_lane(self, lane: str):
+        """Abre de nuevo el canal de un carril y vuelve a registrar su consumidor"""
+        if self.stopping or lane in self._lane_channels or self.connection is None or not self.connection.is_open:
+            return
+        self.connection.channel(on_open_callback=functools.partial(self.on_lane_channel_open, lane))
+
+    def is_current(self, channel) -> bool:
+        """Indica si el canal sigue abierto y en uso (sus delivery tags son válidos)"""
+        return channel.is_open and (channel is self.channel or channel in self._lane_channels.values())
+
+    def on_route(self, channel, method, properties, body):
+        """Reenvía un mensaje de la cola principal a la cola de su carril"""
+        try:
+            message_data = json_codec.loads(body)
+        except json_codec.JSONDecodeError:
+            message_data = None
+        if not isinstance(message_data, dict):
+            logger.error("Error decodificando JSON del mensaje")
+            self.dead_letter(channel, method.delivery_tag, properties, body, "JSON inválido")
+            return
+
+        channel.basic_publish(
+            exchange="",
+            routing_key=worker_queues.lane_queue_name(worker_queues.lane_for(message_data.get('type'))),
+            body=body,
+            properties=worker_queues.lane_properties(properties)
         )
+        channel.basic_ack(delivery_tag=method.delivery_tag)
 
-    async def on_message(self, channel, method, properties, body):
-        """Procesa mensaje recibido"""
+    def on_message(self, channel, method, properties, body):
+        """Recibe un mensaje (callback síncrono de pika) y agenda su procesamiento"""
         try:
-            # Decodificar mensaje
-            message_data = json.loads(body.decode('utf-8'))
-            logger.info(f"Procesando mensaje: {message_data.get('type', 'unknown')}")
+            message_data = json_codec.loads(body)
+        except json_codec.JSONDecodeError:
+            message_data = None
+        if not isinstance(message_data, dict):
+            logger.error("Error decodificando JSON del mensaje")
+            self.dead_letter(channel, method.delivery_tag, properties, body, "JSON inválido")
+            return
 
-            # Procesar según tipo de mensaje
+        task = asyncio.get_running_loop().create_task(
+            self.handle_message(channel, method.delivery_tag, properties, body, message_data)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def handle_message(self, channel, delivery_tag: int, properties, body: bytes, message_data: dict):
+        """Procesa un mensaje respetando el límite de su tipo y lo confirma"""
+        message_type = message_data.get('type', 'unknown')
+
+        dedup_key = None
+        if dedup_store.enabled and message_type in settings.worker_dedup_types:
+            dedup_key, dedup_ttl = dedup_store.message_key(properties, body, message_data)
+            state = await dedup_store.claim(dedup_key, dedup_ttl)
+            if state == DONE:
+                logger.info(f"Mensaje {message_type} duplicado ya procesado, se descarta")
+                self.settle(channel, delivery_tag, properties, body, None)
+                return
+            if state == IN_PROGRESS:
+                logger.info(f"Mensaje {message_type} duplicado en proceso en otro worker, se pospone")
+                self.defer(channel, delivery_tag, properties, body)
+                return
+
+        lane = worker_queues.lane_for(message_type)
+        limiter = self._limiters.get(message_type)
+        if limiter is not None:
+            await limiter.acquire()
+        start = time.time()
+        queued_at = worker_queues.queued_at(properties)
+        if queued_at is not None:
+            worker_lane_wait.labels(lane).observe(max(0.0, start - queued_at))
+        self._lane_in_flight[lane] += 1
+        error = None
+        side_effects: List[str] = []
+        _side_effects.set(side_effects)
+        try:
+            logger.info(f"Procesando mensaje: {message_type} (carril {lane})")
             await self.process_message(message_data)
-
-            # Confirmar mensaje procesado
-            channel.basic_ack(delivery_tag=method.delivery_tag)
-            logger.info("Mensaje procesado exitosamente")
-
-        except json.JSONDecodeError:
-            logger.error("Error decodificando JSON del mensaje")
-            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
         except Exception as e:
-            logger.error(f"Error procesando mensaje: {str(e)}")
-            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            logger.error(f"Error procesando mensaje {message_type}: {str(e)}")
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self._lane_in_flight[lane] -= 1
+            if limiter is not None:
+                limiter.release()
+        worker_message_duration.labels(lane, "error" if error else "ok").observe(time.time() - start)
+
+        if dedup_key is not None:
+            if error is None:
+                await dedup_store.complete(dedup_key, dedup_ttl)
+            elif side_effects:
+                # El envío ya ocurrió: se conserva la marca para que el reintento no lo repita
+                logger.warning(f"Mensaje {message_type} falló tras {', '.join(side_effects)}; se marca como completado")
+                await dedup_store.complete(dedup_key, dedup_ttl)
+            else:
+                await dedup_store.release(dedup_key)
+
+        (self.failed if error else self.processed)[message_type] += 1
+        self.settle(channel, delivery_tag, properties, body, error)
+
+    def settle(self, channel, delivery_tag: int, properties, body: bytes, error: Optional[str]):
+        """Confirma un mensaje en el canal que lo entregó; si falló lo reprograma.
+
+        Un mensaje fallido se publica en la cola de reintento de su intento
+        (o en la dead-letter queue al agotar ``worker_max_attempts``) y luego
+        se confirma el original: nunca vuelve de inmediato a la cola principal.
+        """
+        if not self.is_current(channel):
+            # El delivery tag ya no es válido: RabbitMQ reentregará el mensaje
+            logger.warning(f"Canal cerrado, no se confirma el mensaje {delivery_tag}")
+            return
+        if error is None:
+            channel.basic_ack(delivery_tag=delivery_tag)
+            logger.info("Mensaje procesado exitosamente")
+            return
+
+        queue, failed, dead = worker_queues.failure_destination(properties)
+        if dead:
+            self.dead_letter(channel, delivery_tag, properties, body, error, failed)
+            return
+        channel.basic_publish(
+            exchange="",
+            routing_key=queue,
+            body=body,
+            properties=worker_queues.failure_properties(properties, failed, error)
+        )
+        channel.basic_ack(delivery_tag=delivery_tag)
+        logger.warning(f"Mensaje reprogramado en {queue} (intento {failed} de {settings.worker_max_attempts})")
+
+    def defer(self, channel, delivery_tag: int, properties, body: bytes):
+        """Pospone un mensaje al primer nivel de reintento sin contarlo como intento fallido"""
+        if not self.is_current(channel):
+            return
+        if not settings.worker_retry_delays:
+            channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+            return
+        channel.basic_publish(
+            exchange="",
+            routing_key=worker_queues.retry_queue_name(settings.worker_retry_delays[0]),
+            body=body,
+            properties=properties
+        )
+        channel.basic_ack(delivery_tag=delivery_tag)
+
+    def dead_letter(self, channel, delivery_tag: int, properties, body: bytes, error: str,
+                    failed: Optional[int] = None):
+        """Mueve un mensaje a la dead-letter queue y confirma el original"""
+        if failed is None:
+            failed = worker_queues.attempts(properties) + 1
+        channel.basic_publish(
+            exchange="",
+            routing_key=worker_queues.dead_letter_queue_name(),
+            body=body,
+            properties=worker_queues.failure_properties(properties, failed, error)
+        )
+        channel.basic_ack(delivery_tag=delivery_tag)
+        logger.error(f"Mensaje enviado a la dead-letter queue tras {failed} intentos: {error}")
 
     async def process_message(self, message_data: dict):
         """Procesa diferentes tipos de mensajes"""
@@ -131,126 +355,123 @@ class MikrowispWorker:
 
     async def process_client_query(self, data: dict):
         """Procesa consulta de cliente"""
+        query = data.get('query', '')
+        client_id = data.get('client_id')
+
+        # Obtener contexto del cliente si está disponible
+        client_context = None
+        if client_id:
+            try:
+                client_response = await mikrowisp_client.get_client_details(client_id=client_id)
+                client_context = client_response.get('datos', [])
+            except Exception as e:
+                logger.warning(f"No se pudo obtener contexto del cliente {client_id}: {e}")
+
+        # Procesar con IA
+        ai_response = await openai_service.process_client_query(query, client_context)
+
+        # Enviar respuesta a N8N
+        await n8n_service.trigger_workflow({
+            'client_id': client_id,
+            'query': query,
+            'response': ai_response,
+            'timestamp': datetime.utcnow().isoformat()
+        }, 'client_response')
+
+    async def notify_n8n(self, data: dict, workflow_type: str):
+        """Notifica a N8N tras un envío ya hecho; los errores se registran sin propagarse"""
         try:
-            query = data.get('query', '')
-            client_id = data.get('client_id')
-
-            # Obtener contexto del cliente si está disponible
-            client_context = None
-            if client_id:
-                try:
-                    client_response = await mikrowisp_client.get_client_details(client_id=client_id)
-                    client_context = client_response.get('datos', [])
-                except Exception as e:
-                    logger.warning(f"No se pudo obtener contexto del cliente {client_id}: {e}")
-
-            # Procesar con IA
-            ai_response = await openai_service.process_client_query(query, client_context)
-
-            # Enviar respuesta a N8N
-            await n8n_service.trigger_workflow({
-                'client_id': client_id,
-                'query': query,
-                'response': ai_response,
-                'timestamp': datetime.utcnow().isoformat()
-            }, 'client_response')
-
+            await n8n_service.trigger_workflow(data, workflow_type)
         except Exception as e:
-            logger.error(f"Error procesando consulta de cliente: {e}")
+            logger.error(f"Error notificando {workflow_type} a N8N para el cliente {data.get('client_id')}: {str(e)}")
 
     async def process_auto_sms(self, data: dict):
         """Procesa envío automático de SMS"""
-        try:
-            client_id = data.get('client_id')
-            message_type = data.get('message_type', 'general')
-            custom_message = data.get('custom_message')
-
-            if custom_message:
-                message = custom_message
-            else:
-                # Generar mensaje con IA
-                client_data = data.get('client_data', {})
-                message = await openai_service.generate_sms_content(message_type, client_data)
+        client_id = data.get('client_id')
+        message_type = data.get('message_type', 'general')
+        custom_message = data.get('custom_message')
 
-            # Enviar SMS
-            result = await mikrowisp_client.send_sms(client_id, message)
+        if custom_message:
+            message = custom_message
+        else:
+            # Generar mensaje con IA
+            client_data = data.get('client_data', {})
+            message = await openai_service.generate_sms_content(message_type, client_data)
 
-            # Notificar a N8N
-            await n8n_service.trigger_workflow({
-                'client_id': client_id,
-                'message': message,
-                'result': result
-            }, 'sms_sent')
+        # Enviar SMS
+        result = await mikrowisp_client.send_sms(client_id, message)
+        mark_side_effect("sms")
 
-        except Exception as e:
-            logger.error(f"Error enviando SMS automático: {e}")
+        # Notificar a N8N (un fallo aquí no debe reintentar el SMS ya enviado)
+        await self.notify_n8n({
+            'client_id': client_id,
+            'message': message,
+            'result': result
+        }, 'sms_sent')
 
     async def process_payment_reminder(self, data: dict):
         """Procesa recordatorio de pago"""
-        try:
-            client_id = data.get('client_id')
-
-            # Obtener facturas pendientes
-            invoices = await mikrowisp_client.get_invoices({
-                'idcliente': client_id,
-                'estado': 1  # No pagadas
-            })
-
-            if invoices.get('facturas'):
-                # Generar mensaje de recordatorio
-                message = await openai_service.generate_sms_content(
-                    'pago_recordatorio',
-                    {'client_id': client_id, 'invoices': invoices['facturas']}
-                )
-
-                # Enviar SMS
-                await mikrowisp_client.send_sms(client_id, message)
-
-                # Notificar a N8N
-                await n8n_service.trigger_workflow({
-                    'client_id': client_id,
-                    'reminder_sent': True,
-                    'pending_invoices': len(invoices['facturas'])
-                }, 'payment_reminder_sent')
+        client_id = data.get('client_id')
 
-        except Exception as e:
-            logger.error(f"Error procesando recordatorio de pago: {e}")
+        # Obtener facturas pendientes
+        invoices = await mikrowisp_client.get_invoices({
+            'idcliente': client_id,
+            'estado': 1  # No pagadas
+        })
 
-    async def process_data_sync(self, data: dict):
-        """Procesa sincronización de datos"""
-        try:
-            sync_type = data.get('sync_type', 'full')
-
-            if sync_type == 'clients':
-                # Sincronizar datos de clientes
-                await self.sync_clients_data()
-            elif sync_type == 'invoices':
-                # Sincronizar facturas
-                await self.sync_invoices_data()
-            elif sync_type == 'full':
-                # Sincronización completa
-                await self.sync_clients_data()
-                await self.sync_invoices_data()
+        if invoices.get('facturas'):
+            # Generar mensaje de recordatorio
+            message = await openai_service.generate_sms_content(
+                'pago_recordatorio',
+                {'client_id': client_id, 'invoices': invoices['facturas']}
+            )
 
-        except Exception as e:
-            logger.error(f"Error en sincronización de datos: {e}")
+            # Enviar SMS
+            await mikrowisp_client.send_sms(client_id, message)
+            mark_side_effect("sms")
 
-    async def sync_clients_data(self):
+            # Notificar a N8N (un fallo aquí no debe reintentar el SMS ya enviado)
+            await self.notify_n8n({
+                'client_id': client_id,
+                'reminder_sent': True,
+                'pending_invoices': len(invoices['facturas'])
+            }, 'payment_reminder_sent')
+
+    async def process_data_sync(self, data: dict):
+        """Procesa sincronización de datos"""
+        sync_type = data.get('sync_type', 'full')
+        full = data.get('mode') == 'full'
+
+        if sync_type == 'clients':
+            # Sincronizar datos de clientes
+            await self.sync_clients_data(full, data.get('client_ids'))
+        elif sync_type == 'invoices':
+            # Sincronizar facturas
+            await self.sync_invoices_data(full, data.get('filters'))
+        elif sync_type == 'full':
+            # Sincronización completa
+            await self.sync_clients_data(full)
+            await self.sync_invoices_data(full)
+
+    async def sync_clients_data(self, full: bool = False, client_ids: list = None):
         """Sincroniza datos de clientes"""
         logger.info("Iniciando sincronización de clientes")
-        # Implementar lógica de sincronización según necesidades
-        pass
+        await sync_engine.sync_clients(full=full, client_ids=client_ids)
 
-    async def sync_invoices_data(self):
+    async def sync_invoices_data(self, full: bool = False, filters: dict = None):
         """Sincroniza datos de facturas"""
         logger.info("Iniciando sincronización de facturas")
-        # Implementar lógica de sincronización según necesidades
-        pass
+        await sync_engine.sync_invoices(full=full, filters=filters)
+
+    def schedule_reconnect(self):
+        """Programa una nueva conexión en el event loop tras ``RECONNECT_DELAY`` segundos"""
+        asyncio.get_running_loop().call_later(RECONNECT_DELAY, self.reconnect)
 
     def reconnect(self):
-        """Reconecta a RabbitMQ"""
-        self.should_reconnect = True
-        self.connection.ioloop.stop()
+        """Reconecta a RabbitMQ (los mensajes en vuelo del canal anterior se reentregarán)"""
+        if self.stopping:
+            return
+        asyncio.ensure_future(self.connect())
 
     def close_connection(self):
         """Cierra la conexión"""
@@ -258,25 +479,94 @@ class MikrowispWorker:
             logger.info("Cerrando conexión a RabbitMQ")
             self.connection.close()
 
-
-async def main():
-    """Función principal del worker"""
+    async def stop(self, timeout: float):
+        """Deja de consumir, espera los mensajes en vuelo y cierra la conexión.
+
+        Los mensajes que no terminan en ``timeout`` segundos se cancelan sin
+        confirmar, así RabbitMQ los reentrega a otro worker.
+        """
+        self.stopping = True
+        for channel, consumer_tag in self._consumers:
+            if channel.is_open:
+                channel.basic_cancel(consumer_tag)
+        self._consumers.clear()
+
+        if self._tasks:
+            logger.info(f"Esperando {len(self._tasks)} mensajes en vuelo")
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                logger.warning(f"{len(pending)} mensajes sin terminar tras {timeout}s, se reentregarán")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        self.close_connection()
+        while self.connection is not None and not self.connection.is_closed:
+            await asyncio.sleep(0.05)
+
+    def stats(self) -> Dict[str, Any]:
+        """Mensajes procesados, fallidos y en vuelo del proceso"""
+        return {
+            "connected": self.channel is not None and self.channel.is_open,
+            "uptime": round(time.time() - self.started_at, 1),
+            "in_flight": len(self._tasks),
+            "processed": sum(self.processed.values()),
+            "failed": sum(self.failed.values()),
+            "by_type": {
+                message_type: {"processed": self.processed[message_type], "failed": self.failed[message_type]}
+                for message_type in set(self.processed) | set(self.failed)
+            },
+            "lanes": {
+                lane: {
+                    "budget": budget,
+                    "in_flight": self._lane_in_flight[lane],
+                    "consuming": lane in self._lane_channels,
+                }
+                for lane, budget in settings.worker_lanes.items()
+            },
+            "limiters": {message_type: limiter.stats() for message_type, limiter in self._limiters.items()},
+            "dedup": dedup_store.stats(),
+        }
+
+
+async def report_stats(worker: MikrowispWorker, on_stats: Callable[[Dict[str, Any]], None]):
+    """Publica periódicamente las estadísticas del worker (p.ej. hacia el supervisor)"""
+    while True:
+        on_stats(worker.stats())
+        await asyncio.sleep(settings.supervisor_report_interval)
+
+
+async def main(on_stats: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """Función principal del worker; SIGTERM/SIGINT drenan los mensajes en vuelo"""
     worker = MikrowispWorker()
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
 
+    reporter = None
     try:
-        # Conectar y mantener el worker corriendo
+        # Conectar y mantener el worker corriendo hasta recibir una señal
+        await dedup_store.startup()
         await worker.connect()
+        if on_stats is not None:
+            reporter = asyncio.create_task(report_stats(worker, on_stats))
 
-        # Mantener el worker corriendo
-        while True:
-            await asyncio.sleep(1)
-
-    except KeyboardInterrupt:
+        await stop_event.wait()
         logger.info("Cerrando worker...")
-        worker.close_connection()
+        await worker.stop(settings.worker_drain_timeout)
+
     except Exception as e:
         logger.error(f"Error en worker: {e}")
+        worker.stopping = True
         worker.close_connection()
+        raise
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        await mikrowisp_client.shutdown()
+        await dedup_store.shutdown()
+        await dispose_engine()
 
 
 if __name__ == "__main__":